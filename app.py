@@ -6,12 +6,14 @@
 #   - Otherwise generates safe search links (Etsy / Pinterest / Web) from the idea title
 
 from types import SimpleNamespace
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from urllib.parse import quote_plus
 
 import streamlit as st
 
-from backend.recommender import generate_batch, generate_cards
+from backend.config import DEBUG_PANEL
+from backend.recommender import stream_again, stream_batch
+from backend.tracing import trace
 
 
 st.set_page_config(page_title="GiftBot", page_icon="🎁", layout="wide")
@@ -32,6 +34,8 @@ def _init_state() -> None:
         "last_selected_ideas": None,
         "last_cards": None,
         "last_draft": "",
+        "last_trace": None,
+        "shown_ideas": [],
     }
     for k, v in defaults.items():
         if k not in st.session_state:
@@ -189,6 +193,23 @@ def _render_ideas(items: Any, budget: Optional[float], title_fallback: str = "Gi
                     st.link_button("Search Web", links["Search Web"], use_container_width=True)
 
 
+def _render_idea_preview(slot: Any, idx: int, idea: Any, link_pending: bool) -> None:
+    # Lightweight live view while the batch streams in (full cards render once it is done)
+    d = _card_to_dict(idea)
+    title = _pick_first(d, ["title", "name", "idea", "headline", "gift"]) or "Gift idea"
+    desc = _pick_first(d, ["description", "desc", "why", "why_it_fits", "summary", "details", "reason"])
+
+    lines = [f"**{idx}. {title}**"]
+    if desc:
+        lines.append(desc)
+    link = _safe_external_url(d.get("buy_link"))
+    if link:
+        lines.append(f"[Buy link]({link})")
+    elif link_pending:
+        lines.append("_Finding a buy link..._")
+    slot.markdown("\n\n".join(lines))
+
+
 def _split_cards_and_draft(output: Any) -> Tuple[List[Any], str]:
     if output is None:
         return [], ""
@@ -227,6 +248,67 @@ def _split_cards_and_draft(output: Any) -> Tuple[List[Any], str]:
     return [output], ""
 
 
+def _profile_from_state() -> SimpleNamespace:
+    budget_val = float(st.session_state.get("budget", 50.0) or 50.0)
+    no_go_list = st.session_state.get("exclude_ideas", []) or []
+    return SimpleNamespace(
+        recipient=st.session_state.get("recipient", "") or "",
+        relationship=st.session_state.get("relationship", "") or "",
+        age=st.session_state.get("age", None),
+        personality=st.session_state.get("personality", "") or "",
+        interests=st.session_state.get("interests", "") or "",
+        occasion=st.session_state.get("occasion", "") or "",
+        budget=budget_val,
+        budget_usd=budget_val,
+        no_go=", ".join(no_go_list),
+        exclude_ideas=no_go_list,
+        extra="",
+        extra_notes="",
+        prompt="",
+    )
+
+
+def _stream_new_batch(events: Iterator[Any], trace_name: str = "generate_ideas") -> Tuple[Any, str]:
+    with trace(trace_name) as req_trace:
+        with st.status("Generating ideas...", expanded=True) as status:
+            # Ideas show up as soon as they are ranked; buy links and the draft fill in as they arrive
+            idea_slots: Dict[int, Any] = {}
+            draft_slot = None
+            streamed = ""
+            batch, output = None, ""
+
+            for ev in events:
+                if ev.kind in ("idea", "buy_link"):
+                    if ev.index not in idea_slots:
+                        idea_slots[ev.index] = st.empty()
+                    _render_idea_preview(idea_slots[ev.index], ev.index + 1, ev.idea, link_pending=ev.kind == "idea")
+                elif ev.kind == "cards_delta":
+                    if draft_slot is None:
+                        draft_slot = st.empty()
+                    streamed += ev.text
+                    draft_slot.text(streamed)
+                elif ev.kind == "done":
+                    batch, output = ev.batch, ev.text
+
+            status.update(label="Ideas ready", state="complete", expanded=False)
+
+    st.session_state["last_trace"] = req_trace.to_dict()
+    return batch, output
+
+
+def _store_batch(batch: Any, output: Any) -> None:
+    selected_ideas = _extract_selected_ideas(batch)
+    cards, draft = _split_cards_and_draft(output)
+
+    st.session_state["last_batch"] = batch
+    st.session_state["last_selected_ideas"] = selected_ideas
+    st.session_state["last_cards"] = cards
+    st.session_state["last_draft"] = draft
+    st.session_state["shown_ideas"] = list(st.session_state.get("shown_ideas", [])) + [
+        g.name for g in (getattr(batch, "ideas", None) or [])
+    ]
+
+
 _init_state()
 
 st.title("🎁 GiftBot")
@@ -258,41 +340,38 @@ with center:
         st.session_state["last_selected_ideas"] = None
         st.session_state["last_cards"] = None
         st.session_state["last_draft"] = ""
+        st.session_state["last_trace"] = None
+        st.session_state["shown_ideas"] = []
         st.rerun()
 
     st.session_state["exclude_ideas"] = _parse_excludes(st.session_state.get("exclude_ideas_text", ""))
 
+    again_disabled = st.session_state.get("last_batch") is None
+    again_clicked = st.button(
+        "Generate again",
+        use_container_width=True,
+        disabled=again_disabled,
+        help="More ideas for the same profile; uses the unused candidates first.",
+    )
+
     if generate_clicked:
-        budget_val = float(st.session_state.get("budget", 50.0) or 50.0)
+        st.session_state["shown_ideas"] = []
         no_go_list = st.session_state.get("exclude_ideas", []) or []
-        no_go_text = ", ".join(no_go_list)
-
-        profile = SimpleNamespace(
-            recipient=st.session_state.get("recipient", "") or "",
-            relationship=st.session_state.get("relationship", "") or "",
-            age=st.session_state.get("age", None),
-            personality=st.session_state.get("personality", "") or "",
-            interests=st.session_state.get("interests", "") or "",
-            occasion=st.session_state.get("occasion", "") or "",
-            budget=budget_val,
-            budget_usd=budget_val,
-            no_go=no_go_text,
-            exclude_ideas=no_go_list,
-            extra="",
-            extra_notes="",
-            prompt="",
-        )
+        _store_batch(*_stream_new_batch(stream_batch(_profile_from_state(), exclude_names=set(no_go_list), k=5)))
+        if again_disabled:
+            # The button above was drawn before there was a batch; redrawing enables it
+            st.rerun()
 
-        with st.status("Generating ideas...", expanded=False):
-            batch = generate_batch(profile, exclude_names=no_go_list, k=5)
-            selected_ideas = _extract_selected_ideas(batch)
-            output = generate_cards(profile, selected_ideas)
-            cards, draft = _split_cards_and_draft(output)
+    elif again_clicked:
+        no_go_list = st.session_state.get("exclude_ideas", []) or []
+        seen = list(st.session_state.get("shown_ideas", []))
 
-        st.session_state["last_batch"] = batch
-        st.session_state["last_selected_ideas"] = selected_ideas
-        st.session_state["last_cards"] = cards
-        st.session_state["last_draft"] = draft
+        # Unused candidates from the last batch come back without ranking or search; their buy
+        # links and card text still stream in. A new batch is generated once they run out.
+        events = stream_again(
+            _profile_from_state(), st.session_state["last_batch"], set(no_go_list) | set(seen), k=5
+        )
+        _store_batch(*_stream_new_batch(events, trace_name="generate_again"))
 
 
 st.subheader("Gift ideas")
@@ -310,3 +389,11 @@ draft = st.session_state.get("last_draft", "")
 if isinstance(draft, str) and draft.strip():
     st.subheader("Message draft")
     st.text_area("Draft", value=draft, height=220)
+
+last_trace = st.session_state.get("last_trace")
+if DEBUG_PANEL and last_trace:
+    with st.expander("Debug: pipeline trace"):
+        st.write(f"Total: {last_trace['duration_ms']:.0f} ms")
+        st.json(last_trace["counters"])
+        st.json(last_trace["stages_ms"])
+        st.json(last_trace["spans"], expanded=False)
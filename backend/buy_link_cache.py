@@ -0,0 +1,93 @@
+# backend/buy_link_cache.py
+
+import json
+import re
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional, Tuple
+
+from .cache import SqliteStore, TTLCache, content_key
+from .config import BUY_LINK_CACHE_TTL_S, BUY_LINK_CACHE_STALE_S, BUY_LINK_CACHE_MAX_ITEMS
+from .config import BUY_LINK_CACHE_PATH, BUY_LINK_CACHE_BUDGET_BANDS, BUY_LINK_CACHE_DB_MAX_ROWS
+from .providers import selected_name
+
+_NON_WORD_RE = re.compile(r"[^a-z0-9$]+")
+
+
+@dataclass
+class CachedLink:
+    """A buy link chosen for an idea name."""
+    url: str
+    domain_weight: float
+    found_at: float
+
+
+def normalize_idea_name(name: str) -> str:
+    """Lowercase words only, so "Personalized Star Map!" and "personalized star-map" share a key."""
+    return " ".join(_NON_WORD_RE.sub(" ", (name or "").lower()).split())
+
+
+def budget_band(budget_usd: Optional[float]) -> str:
+    """Which BUY_LINK_CACHE_BUDGET_BANDS interval a budget falls in ("" when unknown or banding is off)."""
+    if budget_usd is None or not BUY_LINK_CACHE_BUDGET_BANDS:
+        return ""
+    for edge in BUY_LINK_CACHE_BUDGET_BANDS:
+        if budget_usd <= edge:
+            return f"<={edge:g}"
+    return f">{BUY_LINK_CACHE_BUDGET_BANDS[-1]:g}"
+
+
+def link_key(idea_name: str, budget_usd: Optional[float] = None) -> str:
+    # Provider names are part of the key so offline/local links never reach live sessions
+    return content_key(
+        normalize_idea_name(idea_name),
+        budget_band(budget_usd),
+        selected_name("chat"),
+        selected_name("search"),
+    )
+
+
+class BuyLinkCache:
+    """
+    Buy links keyed by link_key(): fresh for ttl_s, then served stale for stale_s more while
+    the caller looks for a newer one. Kept in a process-wide LRU and optionally a SQLite file
+    shared by every worker process.
+    """
+
+    def __init__(
+        self, max_items: int, ttl_s: float, stale_s: float, path: Optional[str] = None, max_rows: Optional[int] = None
+    ):
+        self.memory = TTLCache(max_items, ttl_s=ttl_s, stale_s=stale_s)
+        self.store = SqliteStore(
+            path, table="buy_links", max_age_s=ttl_s + stale_s, max_rows=max_rows
+        ) if path else None
+
+    def get(self, key: str) -> Optional[Tuple[CachedLink, bool]]:
+        """Returns (link, is_stale) or None."""
+        hit = self.memory.get(key)
+        if hit is not None or self.store is None:
+            return hit
+
+        row = self.store.get_entry(key)
+        if row is None:
+            return None
+        blob, found_at = row
+        # Warming memory with the original timestamp so freshness keeps counting from when it was found
+        self.memory.put(key, CachedLink(**json.loads(blob)), created_at=found_at)
+        return self.memory.get(key)
+
+    def put(self, key: str, url: str, domain_weight: float) -> None:
+        link = CachedLink(url=url, domain_weight=domain_weight, found_at=time.time())
+        self.memory.put(key, link, created_at=link.found_at)
+        if self.store is not None:
+            self.store.put_many([(key, json.dumps(asdict(link)).encode("utf-8"))], created_at=link.found_at)
+
+    def clear(self) -> None:
+        """Empties the in-memory layer (the SQLite file keeps its entries until they expire)."""
+        self.memory.clear()
+
+
+buy_link_cache = BuyLinkCache(
+    BUY_LINK_CACHE_MAX_ITEMS, BUY_LINK_CACHE_TTL_S, BUY_LINK_CACHE_STALE_S, BUY_LINK_CACHE_PATH or None,
+    BUY_LINK_CACHE_DB_MAX_ROWS,
+)
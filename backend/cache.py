@@ -0,0 +1,227 @@
+# backend/cache.py
+
+import os
+import sqlite3
+import threading
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def content_key(*parts: str) -> str:
+    """Stable hash key for a tuple of strings."""
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(p.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class LRUCache:
+    """Small thread-safe in-memory LRU map."""
+
+    def __init__(self, max_items: int):
+        self.max_items = max(0, int(max_items))
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: str, value: Any) -> None:
+        if self.max_items == 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TTLCache(LRUCache):
+    """
+    LRU map whose entries carry a creation time.
+    get() returns (value, is_stale): fresh for ttl_s, then stale for stale_s more
+    (still served, so the caller can refresh in the background), then dropped.
+    """
+
+    def __init__(self, max_items: int, ttl_s: float, stale_s: float = 0.0):
+        super().__init__(max_items)
+        self.ttl_s = ttl_s
+        self.stale_s = stale_s
+
+    def get(self, key: str) -> Optional[Tuple[Any, bool]]:
+        entry = super().get(key)
+        if entry is None:
+            return None
+        value, created_at = entry
+        age = time.time() - created_at
+        if age > self.ttl_s + self.stale_s:
+            self.pop(key)
+            return None
+        return value, age > self.ttl_s
+
+    def put(self, key: str, value: Any, created_at: Optional[float] = None) -> None:
+        super().put(key, (value, time.time() if created_at is None else created_at))
+
+
+class SqliteStore:
+    """
+    Local key -> bytes store backed by one SQLite file.
+    Shared by all threads in the process; writes are serialized with a lock.
+    With max_age_s / max_rows set, rows older than max_age_s and the oldest rows beyond
+    max_rows are deleted when the store opens and then every PRUNE_EVERY writes.
+    """
+
+    PRUNE_EVERY = 256
+
+    def __init__(self, path: str, table: str = "kv", max_age_s: Optional[float] = None, max_rows: Optional[int] = None):
+        self.path = path
+        self.table = table
+        self.max_age_s = max_age_s
+        self.max_rows = max_rows
+        self._writes = 0
+        self._lock = threading.Lock()
+        # Opened on first use, so importing a module that owns a store touches no files
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        """The connection, opening the file (and pruning it) the first time. Call with the lock held."""
+        if self._conn is None:
+            if self.path != ":memory:":
+                parent = os.path.dirname(os.path.abspath(self.path))
+                os.makedirs(parent, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_created_at ON {self.table} (created_at)")
+            conn.commit()
+            self._conn = conn
+            self._prune_locked()
+        return self._conn
+
+    def prune(self) -> int:
+        """Deletes expired rows, then the oldest rows over max_rows; returns how many went."""
+        with self._lock:
+            self._db()
+            return self._prune_locked()
+
+    def _prune_locked(self) -> int:
+        if self.max_age_s is None and self.max_rows is None:
+            return 0
+        conn = self._conn
+        deleted = 0
+        if self.max_age_s is not None:
+            deleted += conn.execute(
+                f"DELETE FROM {self.table} WHERE created_at < ?", (time.time() - self.max_age_s,)
+            ).rowcount
+        if self.max_rows is not None:
+            deleted += conn.execute(
+                f"DELETE FROM {self.table} WHERE rowid IN ("
+                f"SELECT rowid FROM {self.table} ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,),
+            ).rowcount
+        conn.commit()
+        return deleted
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        keys = list(keys)
+        out: Dict[str, bytes] = {}
+        # Staying under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            marks = ",".join("?" for _ in chunk)
+            with self._lock:
+                rows = self._db().execute(
+                    f"SELECT key, value FROM {self.table} WHERE key IN ({marks})", chunk
+                ).fetchall()
+            for k, v in rows:
+                out[k] = v
+        return out
+
+    def get_entry(self, key: str) -> Optional[Tuple[bytes, float]]:
+        """Returns (value, created_at) for one key."""
+        with self._lock:
+            row = self._db().execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def iter_all(self, page: int = 5_000) -> Iterator[Tuple[str, bytes, float]]:
+        """Every (key, value, created_at), read in pages so the lock is never held for long."""
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._db().execute(
+                    f"SELECT rowid, key, value, created_at FROM {self.table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last, page),
+                ).fetchall()
+            if not rows:
+                return
+            for rowid, k, v, created_at in rows:
+                yield k, v, created_at
+            last = rows[-1][0]
+
+    def iter_keys(self, prefix: str = "", page: int = 20_000) -> Iterator[str]:
+        """Keys starting with prefix (values are not read), in key order."""
+        last = prefix
+        while True:
+            with self._lock:
+                rows = self._db().execute(
+                    f"SELECT key FROM {self.table} WHERE key > ? AND key >= ? ORDER BY key LIMIT ?",
+                    (last, prefix, page),
+                ).fetchall()
+            keys = [k for (k,) in rows if k.startswith(prefix)]
+            yield from keys
+            if len(keys) < page:
+                return
+            last = keys[-1]
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            with self._lock:
+                conn = self._db()
+                conn.execute(f"DELETE FROM {self.table} WHERE key IN ({','.join('?' for _ in chunk)})", chunk)
+                conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._db()
+            conn.execute(f"DELETE FROM {self.table}")
+            conn.commit()
+
+    def put_many(self, items: List[tuple], created_at: float) -> None:
+        if not items:
+            return
+        with self._lock:
+            conn = self._db()
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at) VALUES (?, ?, ?)",
+                [(k, v, created_at) for k, v in items],
+            )
+            conn.commit()
+            self._writes += 1
+            due = self._writes % self.PRUNE_EVERY == 0
+        if due:
+            self.prune()
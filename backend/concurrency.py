@@ -0,0 +1,106 @@
+# backend/concurrency.py
+
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Coroutine, Iterator, List, Optional, Sequence, TypeVar
+
+from .config import BLOCKING_POOL_SIZE
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """Returns the process-wide event loop, starting its thread on first use."""
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            # Blocking SDK calls (search clients) run here via asyncio.to_thread
+            loop.set_default_executor(
+                ThreadPoolExecutor(max_workers=BLOCKING_POOL_SIZE, thread_name_prefix="giftbot-io")
+            )
+            thread = threading.Thread(target=loop.run_forever, name="giftbot-loop", daemon=True)
+            thread.start()
+            _loop, _loop_thread = loop, thread
+    return _loop
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Runs a coroutine on the shared background loop and blocks until it finishes.
+    Works from Streamlit script threads (which have no loop) and from code that is
+    already inside another event loop. Context variables of the caller are kept.
+    """
+    loop = _background_loop()
+    if threading.current_thread() is _loop_thread:
+        coro.close()
+        raise RuntimeError("run_sync() called from the background loop; await the coroutine instead.")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+def iter_sync(agen: AsyncIterator[T]) -> Iterator[T]:
+    """
+    Drives an async iterator on the background loop and yields its items here as they arrive.
+    If the consumer stops early, the async side is cancelled.
+    """
+    loop = _background_loop()
+    items: "queue.Queue[tuple]" = queue.Queue()
+
+    async def _pump() -> None:
+        try:
+            async for item in agen:
+                items.put(("item", item))
+        except Exception as e:
+            items.put(("error", e))
+        else:
+            items.put(("end", None))
+
+    fut = asyncio.run_coroutine_threadsafe(_pump(), loop)
+    try:
+        while True:
+            kind, item = items.get()
+            if kind == "end":
+                return
+            if kind == "error":
+                raise item
+            yield item
+    finally:
+        fut.cancel()
+
+
+async def gather_bounded(
+    fn: Callable[[T], Awaitable[R]],
+    items: Sequence[T],
+    max_in_flight: int,
+    timeout: Optional[float],
+    on_timeout: Callable[[T], R],
+    deadline: Optional[float] = None,
+) -> List[R]:
+    """
+    Awaits fn(item) for every item with at most max_in_flight running at once.
+    Each call gets its own timeout (counted from when it starts running), cut short by
+    `deadline` (a loop.time() value) when given; a call that times out yields on_timeout(item).
+    Results keep the input order.
+    """
+    sem = asyncio.Semaphore(max(1, max_in_flight))
+    loop = asyncio.get_running_loop()
+
+    async def _one(item: T) -> R:
+        async with sem:
+            budget = timeout
+            if deadline is not None:
+                left = max(0.0, deadline - loop.time())
+                budget = left if budget is None else min(budget, left)
+            try:
+                return await asyncio.wait_for(fn(item), budget)
+            except asyncio.TimeoutError:
+                return on_timeout(item)
+
+    return list(await asyncio.gather(*(_one(it) for it in items)))
@@ -5,6 +5,8 @@ load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "").strip()
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY", "").strip()
+# Tavily REST endpoint, called directly (no SDK); overridable for proxies
+TAVILY_SEARCH_URL = os.getenv("TAVILY_SEARCH_URL", "https://api.tavily.com/search").strip()
 
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-5.2").strip()
 OPENAI_EMBED_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-large").strip()
@@ -15,5 +17,130 @@ ETSY_WEIGHT = 1.35
 DEFAULT_WEIGHT = 1.0
 RETAIL_WEIGHT = 1.15
 
+# Retailer list (domain,weight per line) loaded once into the domain classifier
+RETAIL_DOMAINS_PATH = os.getenv(
+    "RETAIL_DOMAINS_PATH", os.path.join(os.path.dirname(__file__), "data", "retail_domains.csv")
+).strip()
+DOMAIN_CACHE_ITEMS = 65_536
+
+# Idea ranking: score = fit * profile similarity + domain * best evidence domain weight
+# (scaled by RANK_DOMAIN_NORM) + rating * best evidence star rating, over the first
+# RANK_EVIDENCE_PER_IDEA evidence URLs of each idea
+RANK_FIT_WEIGHT = 0.55
+RANK_DOMAIN_WEIGHT = 0.25
+RANK_RATING_WEIGHT = 0.20
+RANK_DOMAIN_NORM = max(PINTEREST_WEIGHT, ETSY_WEIGHT, RETAIL_WEIGHT, DEFAULT_WEIGHT)
+RANK_EVIDENCE_PER_IDEA = 4
+
+# Candidate pool: one extraction call asks for CANDIDATE_POOL_FACTOR x k ideas; they are ranked,
+# ordered for diversity with MMR (MMR_LAMBDA = weight of score vs. novelty) and the ones not
+# shown are kept for "Generate again"
+CANDIDATE_POOL_FACTOR = 3
+MMR_LAMBDA = 0.7
+
+# Free-text profile parsing: fields resolved locally at this confidence or better skip the LLM
+PROFILE_PARSER_MIN_CONFIDENCE = 0.8
+
+# Query planning: "rules" builds the search queries from profile fields with no model call;
+# "llm" asks the chat model (the QUERY_PLANNER prompt) and falls back to the rules when its answer is unusable
+QUERY_PLANNER_MODE = os.getenv("GIFTBOT_QUERY_PLANNER", "rules").strip().lower()
+
 MAX_RESULTS_PER_QUERY = 8
 BUY_LINKS_PER_IDEA = 6
+
+# Search fan-out: how many searches may run at once and how long each may take
+SEARCH_MAX_IN_FLIGHT = 8
+SEARCH_TIMEOUT_S = 15.0
+BLOCKING_POOL_SIZE = 16
+
+# Buy-link stage: ideas resolved in parallel. BUY_LINK_DEADLINE_S bounds the whole stage; the
+# batched query-planning call may use BUY_LINK_QUERIES_TIMEOUT_S of it, the searches the rest
+BUY_LINK_MAX_IN_FLIGHT = 5
+BUY_LINK_DEADLINE_S = 20.0
+BUY_LINK_QUERIES_TIMEOUT_S = 6.0
+
+# Embedding cache: in-memory LRU in front of a local SQLite file ("" disables the file)
+EMBED_CACHE_MEMORY_ITEMS = 50_000
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", ".cache/embeddings.sqlite3").strip()
+EMBED_BATCH_LIMIT = 2048
+
+# JSON LLM response cache, opt-in per call site: comma-separated names from plan_queries,
+# extract_ideas, buy_link_queries, profile_parser (or "all"); "" caches nothing. The SQLite
+# file drops rows older than LLM_CACHE_TTL_S and keeps at most LLM_CACHE_DB_MAX_ROWS
+LLM_CACHE_SITES = frozenset(
+    s.strip() for s in os.getenv("GIFTBOT_LLM_CACHE_SITES", "").lower().split(",") if s.strip()
+)
+LLM_CACHE_TTL_S = 24 * 3600
+LLM_CACHE_MAX_ITEMS = 5_000
+LLM_CACHE_DB_MAX_ROWS = 50_000
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm.sqlite3").strip()
+
+# Search result cache: fresh for TTL, then served stale (and refreshed in the background)
+SEARCH_CACHE_TTL_S = 6 * 3600
+SEARCH_CACHE_STALE_S = 24 * 3600
+SEARCH_CACHE_MAX_ITEMS = 5_000
+# Rows in the SQLite file: dropped after TTL + STALE, and the oldest beyond this count
+SEARCH_CACHE_DB_MAX_ROWS = 100_000
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", ".cache/search.sqlite3").strip()
+
+# Finished-batch cache: the same profile + no-go list is answered from memory, or from a
+# SQLite file shared by every worker process ("" disables the file)
+RESULT_CACHE_TTL_S = 30 * 60
+RESULT_CACHE_MAX_ITEMS = 1_000
+RESULT_CACHE_DB_MAX_ROWS = 20_000
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", ".cache/results.sqlite3").strip()
+
+# Buy links found per idea name (and budget band, upper edges in USD; () ignores budget):
+# served as-is while fresh, then still served but re-searched in the background while stale
+BUY_LINK_CACHE_TTL_S = 3 * 24 * 3600
+BUY_LINK_CACHE_STALE_S = 14 * 24 * 3600
+BUY_LINK_CACHE_MAX_ITEMS = 20_000
+BUY_LINK_CACHE_DB_MAX_ROWS = 200_000
+BUY_LINK_CACHE_BUDGET_BANDS = (25, 50, 100, 250)
+BUY_LINK_CACHE_PATH = os.getenv("BUY_LINK_CACHE_PATH", ".cache/buy_links.sqlite3").strip()
+
+# Near-duplicate profiles ("mom"/"mother", $45 vs $50) reuse the search evidence of a recently
+# served profile when their embeddings are this similar and budgets within this fraction
+SEMANTIC_CACHE_MIN_SIM = 0.93
+SEMANTIC_CACHE_BUDGET_TOLERANCE = 0.2
+SEMANTIC_CACHE_MAX_ITEMS = 2_000
+SEMANTIC_CACHE_TTL_S = SEARCH_CACHE_TTL_S
+
+# Vector index for large document corpora: "exact" (brute force) or "ivf" (approximate,
+# scans IVF_N_PROBE of IVF_N_LISTS clusters per query)
+VECTOR_INDEX_KIND = os.getenv("GIFTBOT_VECTOR_INDEX", "exact").strip().lower()
+IVF_N_LISTS = 256
+IVF_N_PROBE = 16
+
+# Evidence corpus: every live search result is kept (one row per canonical URL) with its
+# embedding and the budgets it was searched for. A request whose profile finds EVIDENCE_MIN_DOCS
+# budget-compatible documents close enough skips query planning and live search ("" keeps the
+# corpus in memory only). "Close enough" is calibrated per embedding model from live searches:
+# the median similarity of the EVIDENCE_MIN_DOCS-th best live result to its profile over the
+# last EVIDENCE_CALIBRATION_SAMPLES searches, i.e. stored documents must be as close as the ones
+# a live search would have returned. EVIDENCE_MIN_SIM is the floor, and the bar until
+# EVIDENCE_CALIBRATION_MIN_SAMPLES searches were seen. Each model's vector index is saved next
+# to the SQLite file (EVIDENCE_INDEX_SAVE_EVERY new vectors) and memory-mapped by new processes.
+# Every EVIDENCE_PRUNE_EVERY additions, rows older than EVIDENCE_MAX_AGE_S and the oldest beyond
+# EVIDENCE_MAX_ROWS are deleted in the background, with their vectors and index entries.
+EVIDENCE_STORE_PATH = os.getenv("EVIDENCE_STORE_PATH", ".cache/evidence.sqlite3").strip()
+EVIDENCE_MIN_SIM = 0.35
+EVIDENCE_MIN_DOCS = 24
+EVIDENCE_TOP_K = 48
+EVIDENCE_MAX_AGE_S = 7 * 24 * 3600
+EVIDENCE_BUDGET_TOLERANCE = 0.5
+EVIDENCE_CALIBRATION_SAMPLES = 200
+EVIDENCE_CALIBRATION_MIN_SAMPLES = 10
+EVIDENCE_INDEX_SAVE_EVERY = 1_000
+EVIDENCE_MAX_ROWS = 100_000
+EVIDENCE_PRUNE_EVERY = 200
+
+# Tracing: log one JSON line per traced request; show the trace panel in the app
+TRACE_LOG = os.getenv("GIFTBOT_TRACE_LOG", "1").strip().lower() not in ("", "0", "false", "no")
+DEBUG_PANEL = os.getenv("GIFTBOT_DEBUG", "").strip().lower() in ("1", "true", "yes")
+
+# Provider selection: "openai" or "local" for chat/embeddings; "auto", "tavily", "duckduckgo" or "local" for search.
+# The local providers are deterministic and offline (load tests, CI perf runs).
+CHAT_PROVIDER = os.getenv("GIFTBOT_CHAT_PROVIDER", "openai").strip().lower()
+EMBED_PROVIDER = os.getenv("GIFTBOT_EMBED_PROVIDER", "openai").strip().lower()
+SEARCH_PROVIDER = os.getenv("GIFTBOT_SEARCH_PROVIDER", "auto").strip().lower()
@@ -0,0 +1,125 @@
+# backend/domains.py
+#
+# Domain classification for ranking and buy-link selection. The retailer table is built once
+# (on first use) from RETAIL_DOMAINS_PATH; a host is weighted by hash lookups of its own
+# label suffixes ("shop.amazon.com" -> "shop.amazon.com", "amazon.com", "com"), so cost grows
+# with the number of labels in the host, not the size of the table.
+
+import csv
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from .config import PINTEREST_WEIGHT, ETSY_WEIGHT, DEFAULT_WEIGHT, RETAIL_WEIGHT
+from .config import RETAIL_DOMAINS_PATH, DOMAIN_CACHE_ITEMS
+
+# Used when the data file is missing
+_BUILTIN = {
+    "pinterest.*": PINTEREST_WEIGHT,
+    "etsy.com": ETSY_WEIGHT,
+    **{d: RETAIL_WEIGHT for d in (
+        "amazon.com", "target.com", "walmart.com", "bestbuy.com", "nike.com", "adidas.com",
+        "crateandbarrel.com", "potterybarn.com", "sephora.com", "ulta.com", "barnesandnoble.com",
+    )},
+}
+
+
+class DomainTable:
+    """
+    Registrable domain -> weight, plus "brand.*" entries that match a label under any suffix.
+    weight() checks exact suffixes first (most specific wins), then brand labels.
+    """
+
+    def __init__(self, weights: Dict[str, float], default: float = DEFAULT_WEIGHT):
+        self.default = default
+        self.suffixes: Dict[str, float] = {}
+        self.brands: Dict[str, float] = {}
+        for domain, w in weights.items():
+            domain = domain.strip().lower().lstrip(".")
+            if domain.endswith(".*"):
+                self.brands[domain[:-2]] = w
+            elif domain:
+                self.suffixes[domain] = w
+
+    @classmethod
+    def from_csv(cls, path: str) -> "DomainTable":
+        """Built-in defaults overlaid with `domain,weight` lines (empty weight = RETAIL_WEIGHT)."""
+        weights = dict(_BUILTIN)
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.reader(f):
+                if not row or row[0].lstrip().startswith("#"):
+                    continue
+                w = row[1].strip() if len(row) > 1 else ""
+                weights[row[0].strip().lower()] = float(w) if w else RETAIL_WEIGHT
+        return cls(weights)
+
+    def lookup(self, host: str) -> Optional[float]:
+        """Weight for a bare lowercase host, or None when no entry matches."""
+        labels = host.split(".")
+        for i in range(len(labels) - 1):
+            w = self.suffixes.get(".".join(labels[i:]))
+            if w is not None:
+                return w
+        # Brand labels never match the last label (the TLD)
+        for label in labels[:-1]:
+            w = self.brands.get(label)
+            if w is not None:
+                return w
+        return None
+
+    def weight(self, host: str) -> float:
+        w = self.lookup(host)
+        return self.default if w is None else w
+
+
+_table: Optional[DomainTable] = None
+_table_lock = threading.Lock()
+
+
+def domain_table() -> DomainTable:
+    global _table
+    if _table is not None:
+        return _table
+    with _table_lock:
+        if _table is None:
+            if RETAIL_DOMAINS_PATH and os.path.exists(RETAIL_DOMAINS_PATH):
+                _table = DomainTable.from_csv(RETAIL_DOMAINS_PATH)
+            else:
+                _table = DomainTable(_BUILTIN)
+    return _table
+
+
+def set_domain_table(table: DomainTable) -> None:
+    """Replaces the active table (e.g. after loading a bigger retailer list) and drops cached weights."""
+    global _table
+    with _table_lock:
+        _table = table
+    host_weight.cache_clear()
+
+
+def url_host(url: str) -> str:
+    """Lowercase host of an http(s) URL without port, credentials or www."""
+    # Fast path for the common "scheme://host/..." shape; urlparse for anything unusual
+    rest = url.partition("://")[2]
+    if rest:
+        host = rest.split("/", 1)[0].split("?", 1)[0].split("#", 1)[0]
+        if "@" not in host and "[" not in host:
+            host = host.split(":", 1)[0].lower()
+            return host[4:] if host.startswith("www.") else host
+    try:
+        host = (urlparse(url).hostname or "").lower()
+    except ValueError:
+        return ""
+    return host[4:] if host.startswith("www.") else host
+
+
+@lru_cache(maxsize=DOMAIN_CACHE_ITEMS)
+def host_weight(host: str) -> float:
+    return domain_table().weight(host) if host else DEFAULT_WEIGHT
+
+
+def domain_weight(url: str) -> float:
+    return host_weight(url_host(url))
+
@@ -0,0 +1,80 @@
+# backend/embed_cache.py
+
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .cache import LRUCache, SqliteStore, content_key
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache keyed by (embed model, text hash).
+    Lookups go memory LRU -> SQLite file -> API; only misses are sent to the API.
+    """
+
+    def __init__(self, memory_items: int, path: Optional[str] = None):
+        self.memory = LRUCache(memory_items)
+        self.store = SqliteStore(path, table="embeddings") if path else None
+
+    def _lookup(self, model: str, texts: List[str]) -> Tuple[List[str], Dict[str, "np.ndarray"], Dict[str, str]]:
+        """Returns (keys, vectors found in memory/disk, unique misses as key -> text)."""
+        import numpy as np
+
+        keys = [content_key(model, t) for t in texts]
+        found: Dict[str, "np.ndarray"] = {}
+
+        for k in keys:
+            v = self.memory.get(k)
+            if v is not None:
+                found[k] = v
+
+        missing = [k for k in dict.fromkeys(keys) if k not in found]
+        if missing and self.store is not None:
+            for k, blob in self.store.get_many(missing).items():
+                v = np.frombuffer(blob, dtype=np.float32)
+                found[k] = v
+                self.memory.put(k, v)
+
+        # Deduplicating misses so each unique text is embedded once
+        todo: Dict[str, str] = {}
+        for k, t in zip(keys, texts):
+            if k not in found and k not in todo:
+                todo[k] = t
+        return keys, found, todo
+
+    def _fill(self, found: Dict[str, "np.ndarray"], todo: Dict[str, str], vectors: List[List[float]]) -> None:
+        import numpy as np
+
+        fresh = []
+        for k, vec in zip(todo.keys(), vectors):
+            v = np.asarray(vec, dtype=np.float32)
+            found[k] = v
+            self.memory.put(k, v)
+            fresh.append((k, v.tobytes()))
+        if self.store is not None:
+            self.store.put_many(fresh, created_at=time.time())
+
+    def embed(
+        self,
+        model: str,
+        texts: List[str],
+        fetch: Callable[[List[str]], List[List[float]]],
+    ) -> List["np.ndarray"]:
+        keys, found, todo = self._lookup(model, texts)
+        if todo:
+            self._fill(found, todo, fetch(list(todo.values())))
+        return [found[k] for k in keys]
+
+    async def aembed(
+        self,
+        model: str,
+        texts: List[str],
+        fetch: Callable[[List[str]], Awaitable[List[List[float]]]],
+    ) -> List["np.ndarray"]:
+        keys, found, todo = self._lookup(model, texts)
+        if todo:
+            self._fill(found, todo, await fetch(list(todo.values())))
+        return [found[k] for k in keys]
@@ -0,0 +1,386 @@
+# backend/evidence_store.py
+
+import json
+import os
+import re
+import shutil
+import sqlite3
+import statistics
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .cache import SqliteStore
+from .config import EVIDENCE_MAX_AGE_S, EVIDENCE_STORE_PATH, EVIDENCE_MIN_SIM, EVIDENCE_MIN_DOCS
+from .config import EVIDENCE_BUDGET_TOLERANCE, EVIDENCE_CALIBRATION_SAMPLES, EVIDENCE_CALIBRATION_MIN_SAMPLES
+from .config import EVIDENCE_INDEX_SAVE_EVERY, EVIDENCE_MAX_ROWS, EVIDENCE_PRUNE_EVERY, VECTOR_INDEX_KIND
+from .models import SearchResult
+from .semantic_cache import budgets_compatible
+from .tracing import count
+
+if TYPE_CHECKING:
+    import numpy as np
+    from .vector_index import VectorIndex
+
+_UNSAFE_RE = re.compile(r"[^A-Za-z0-9._-]+")
+_MAX_BUDGETS_PER_ROW = 8
+_TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "ref", "ref_", "tag", "psc", "th", "pd_rd_i", "pd_rd_r", "pf_rd_p"}
+
+
+def canonical_url(url: str) -> str:
+    """Lowercased host without www., no fragment, trailing slash or tracking parameters."""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in _TRACKING_PARAMS and not k.lower().startswith("utm_")
+    ]
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("https", host, path, urlencode(sorted(query)), ""))
+
+
+class EvidenceStore:
+    """
+    Corpus of past search results, deduplicated by canonical URL.
+    Rows (result, source, domain weight, budgets searched for, timestamp) and float32 embeddings
+    live in SQLite. One vector index per embedding model is saved next to the file and
+    memory-mapped by later processes, which only read the vectors written since the last save.
+    Saving and pruning run on a background thread and never fail the request that added rows.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        # ":memory:" gives the same behaviour without a file (each connection is private)
+        self.path = path
+        self.rows = SqliteStore(
+            path or ":memory:", table="evidence", max_age_s=EVIDENCE_MAX_AGE_S, max_rows=EVIDENCE_MAX_ROWS
+        )
+        self.vectors = SqliteStore(path or ":memory:", table="evidence_vectors")
+        self.calibration = SqliteStore(path or ":memory:", table="evidence_calibration")
+        self._indexes: Dict[str, "VectorIndex"] = {}
+        self._unsaved: Dict[str, int] = {}
+        self._samples: Dict[str, List[float]] = {}
+        self._adds = 0
+        self._prune_due = False
+        self._maintaining = False
+        self._lock = threading.Lock()
+        # Held while an index is loaded or rebuilt, so corpus writes never wait on it
+        self._build_lock = threading.Lock()
+
+    @staticmethod
+    def _vector_key(model: str, url_key: str) -> str:
+        return f"{model}\0{url_key}"
+
+    def _index_dir(self, model: str) -> Optional[str]:
+        if not self.path:
+            return None
+        return os.path.join(f"{self.path}.index", _UNSAFE_RE.sub("_", model))
+
+    def _index(self, model: str, dim: int) -> "VectorIndex":
+        index = self._indexes.get(model)
+        if index is None:
+            with self._build_lock:
+                index = self._indexes.get(model)
+                if index is None:
+                    index = self._load_index(model, dim)
+                    self._indexes[model] = index
+        return index
+
+    def _load_index(self, model: str, dim: int) -> "VectorIndex":
+        import numpy as np
+        from .vector_index import VectorIndex, new_index
+
+        prefix = self._vector_key(model, "")
+        stored = [key[len(prefix):] for key in self.vectors.iter_keys(prefix)]
+        index = None
+        directory = self._index_dir(model)
+        if directory and os.path.exists(os.path.join(directory, "meta.json")):
+            try:
+                index = VectorIndex.load(directory, mmap=True)
+            except (OSError, ValueError, KeyError):
+                index = None
+            if index is not None and (index.dim != dim or index.kind != VECTOR_INDEX_KIND):
+                index = None
+            # Entries pruned since the save (by another process) mean starting over
+            if index is not None and set(index.ids) - set(stored):
+                index = None
+        if index is None:
+            index = new_index(dim)
+
+        # Catching up on vectors written since the save (by any process); keys are read first
+        # so only the missing blobs are loaded
+        known = set(index.ids)
+        missing = [self._vector_key(model, u) for u in stored if u not in known]
+        for i in range(0, len(missing), 10_000):
+            chunk = missing[i:i + 10_000]
+            blobs = self.vectors.get_many(chunk)
+            chunk = [key for key in chunk if key in blobs]
+            if chunk:
+                index.add(
+                    [key[len(prefix):] for key in chunk],
+                    np.stack([np.frombuffer(blobs[key], dtype=np.float32) for key in chunk]),
+                )
+        if missing:
+            self._save_index(model, index)
+        return index
+
+    def _save_index(self, model: str, index: "VectorIndex") -> None:
+        """Best effort: a failed save only means the next process reads more vectors from SQLite."""
+        directory = self._index_dir(model)
+        if directory is None:
+            return
+        # Written aside and swapped in, so a reader never loads a half-written index
+        tag = f"{os.getpid()}-{threading.get_ident()}"
+        tmp, old = f"{directory}.tmp-{tag}", f"{directory}.old-{tag}"
+        try:
+            index.save(tmp)
+            if os.path.exists(directory):
+                os.replace(directory, old)
+            os.replace(tmp, directory)
+        except OSError:
+            # Usually another process swapping its own copy in at the same moment
+            count("evidence_index_save_errors")
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+            shutil.rmtree(old, ignore_errors=True)
+
+    def prune(self) -> int:
+        """
+        Deletes rows older than EVIDENCE_MAX_AGE_S and the oldest beyond EVIDENCE_MAX_ROWS, then
+        the vectors and index entries of URLs no longer in the corpus; returns how many vectors went.
+        """
+        from .vector_index import new_index
+
+        self.rows.prune()
+        keys = list(self.vectors.iter_keys())
+        gone: List[str] = []
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            present = self.rows.get_many(key.split("\0", 1)[1] for key in chunk)
+            gone.extend(key for key in chunk if key.split("\0", 1)[1] not in present)
+        if not gone:
+            return 0
+        self.vectors.delete_many(gone)
+
+        by_model: Dict[str, set] = {}
+        for key in gone:
+            model, url_key = key.split("\0", 1)
+            by_model.setdefault(model, set()).add(url_key)
+        for model, urls in by_model.items():
+            with self._build_lock, self._lock:
+                index = self._indexes.get(model)
+                if index is None:
+                    continue
+                # Copying the surviving vectors out of the live index (no SQLite reads)
+                keep = [i for i, url_key in enumerate(index.ids) if url_key not in urls]
+                rebuilt = new_index(index.dim)
+                if keep:
+                    rebuilt.add([index.ids[i] for i in keep], index.vectors[keep])
+                self._indexes[model] = rebuilt
+                self._unsaved[model] = 0
+            self._save_index(model, rebuilt)
+        return len(gone)
+
+    def _maintain(self) -> None:
+        if self._prune_due:
+            self._prune_due = False
+            self.prune()
+        for model, index in list(self._indexes.items()):
+            if self._unsaved.get(model, 0) >= EVIDENCE_INDEX_SAVE_EVERY:
+                self._unsaved[model] = 0
+                self._save_index(model, index)
+
+    def _maintain_in_background(self) -> None:
+        """Starts _maintain on a daemon thread unless one is already running."""
+        with self._lock:
+            if self._maintaining:
+                return
+            self._maintaining = True
+
+        def _run() -> None:
+            try:
+                self._maintain()
+            except (sqlite3.Error, OSError, ValueError):
+                count("evidence_store_errors")
+            finally:
+                self._maintaining = False
+
+        threading.Thread(target=_run, name="evidence-maintenance", daemon=True).start()
+
+    def min_sim(self, model: str) -> float:
+        """Similarity a stored document needs for `model`: calibrated from live searches, floored at EVIDENCE_MIN_SIM."""
+        samples = self._calibration_samples(model)
+        if len(samples) < EVIDENCE_CALIBRATION_MIN_SAMPLES:
+            return EVIDENCE_MIN_SIM
+        return max(EVIDENCE_MIN_SIM, statistics.median(samples))
+
+    def _calibration_samples(self, model: str) -> List[float]:
+        samples = self._samples.get(model)
+        if samples is None:
+            row = self.calibration.get_entry(model)
+            samples = json.loads(row[0]) if row else []
+            self._samples[model] = samples
+        return samples
+
+    def _calibrate(self, model: str, profile_vector: "np.ndarray", M: "np.ndarray") -> None:
+        import numpy as np
+
+        if len(M) < EVIDENCE_MIN_DOCS:
+            return
+        sims = np.sort(M @ np.asarray(profile_vector, dtype=np.float32).reshape(-1))[::-1]
+        samples = self._calibration_samples(model)
+        samples.append(round(float(sims[EVIDENCE_MIN_DOCS - 1]), 4))
+        del samples[:-EVIDENCE_CALIBRATION_SAMPLES]
+        self.calibration.put_many([(model, json.dumps(samples).encode("utf-8"))], created_at=time.time())
+
+    def add(
+        self,
+        model: str,
+        results: Sequence[SearchResult],
+        vectors: "np.ndarray",
+        domain_weights: Sequence[float],
+        budget_usd: Optional[float] = None,
+        profile_vector: Optional["np.ndarray"] = None,
+    ) -> int:
+        """
+        Stores the results of a live search for a profile by canonical URL; returns how many were
+        new to the corpus for this model. With profile_vector, the search also calibrates min_sim().
+        Best effort: a storage error is counted (evidence_store_errors) and 0 returned.
+        """
+        try:
+            return self._add(model, results, vectors, domain_weights, budget_usd, profile_vector)
+        except (sqlite3.Error, OSError, ValueError):
+            count("evidence_store_errors")
+            return 0
+
+    def _add(
+        self,
+        model: str,
+        results: Sequence[SearchResult],
+        vectors: "np.ndarray",
+        domain_weights: Sequence[float],
+        budget_usd: Optional[float],
+        profile_vector: Optional["np.ndarray"],
+    ) -> int:
+        import numpy as np
+
+        keys = [canonical_url(r.url) for r in results]
+        first: Dict[str, int] = {}
+        for i, k in enumerate(keys):
+            first.setdefault(k, i)
+        if not first:
+            return 0
+
+        M_all = np.asarray(vectors, dtype=np.float32)
+        index = self._index(model, M_all.shape[1])
+        if M_all.shape != (len(results), index.dim):
+            raise ValueError(f"Expected {len(results)} vectors of dim {index.dim}, got {M_all.shape}")
+        with self._lock:
+            # Rows are rewritten (refreshing their timestamp and adding this budget); vectors
+            # only for URLs new to this model
+            known = self.vectors.get_many([self._vector_key(model, k) for k in first])
+            fresh = {k: i for k, i in first.items() if self._vector_key(model, k) not in known}
+            previous = self.rows.get_many(first)
+
+            now = time.time()
+            rows = []
+            for k, i in first.items():
+                budgets = json.loads(previous[k]).get("budgets", [None]) if k in previous else []
+                budgets = [b for b in budgets if b != budget_usd] + [budget_usd]
+                rows.append((k, json.dumps({
+                    "result": results[i].model_dump(), "domain_weight": domain_weights[i],
+                    "budgets": budgets[-_MAX_BUDGETS_PER_ROW:], "created_at": now,
+                }).encode("utf-8")))
+            self.rows.put_many(rows, created_at=now)
+            # A prune may have swapped in a rebuilt index since it was looked up
+            index = self._indexes.get(model, index)
+            if fresh:
+                M = M_all[list(fresh.values())]
+                self.vectors.put_many(
+                    [(self._vector_key(model, k), v.tobytes()) for k, v in zip(fresh, M)], created_at=now
+                )
+                index.add(list(fresh), M)
+            self._unsaved[model] = self._unsaved.get(model, 0) + len(fresh)
+            self._adds += 1
+            if self._adds % EVIDENCE_PRUNE_EVERY == 0:
+                self._prune_due = True
+            if profile_vector is not None:
+                self._calibrate(model, profile_vector, M_all)
+        if self._prune_due or self._unsaved[model] >= EVIDENCE_INDEX_SAVE_EVERY:
+            self._maintain_in_background()
+        return len(fresh)
+
+    def search(
+        self,
+        model: str,
+        vector: "np.ndarray",
+        k: int,
+        min_sim: Optional[float] = None,
+        local_source: bool = False,
+        max_age_s: float = EVIDENCE_MAX_AGE_S,
+        budget_usd: Optional[float] = None,
+    ) -> List[Tuple[SearchResult, float]]:
+        """
+        Closest stored results to `vector` as (result, similarity), best first; only those at
+        min_sim (min_sim(model) unless given) or better, younger than max_age_s and searched for
+        a budget within EVIDENCE_BUDGET_TOLERANCE of budget_usd. Offline ("local") results are
+        only returned when local_source is set, and live ones only when it is not.
+        """
+        if min_sim is None:
+            min_sim = self.min_sim(model)
+        index = self._index(model, len(vector))
+        cutoff = time.time() - max_age_s if max_age_s else 0.0
+        out: List[Tuple[SearchResult, float]] = []
+        # Stale, other-source, other-budget and pruned rows are dropped after the index search, so
+        # the fetch grows until k usable results are found or the neighbours fall below min_sim
+        fetch, done = k * 3, 0
+        while True:
+            hits = index.search(vector, fetch)
+            out.extend(self._usable(hits[done:], min_sim, cutoff, local_source, budget_usd))
+            if len(out) >= k or len(hits) < fetch or not hits or hits[-1][1] < min_sim or fetch >= len(index):
+                return out[:k]
+            done, fetch = len(hits), fetch * 4
+
+    def _usable(
+        self,
+        hits: List[Tuple[str, float]],
+        min_sim: float,
+        cutoff: float,
+        local_source: bool,
+        budget_usd: Optional[float],
+    ) -> List[Tuple[SearchResult, float]]:
+        hits = [(key, s) for key, s in hits if s >= min_sim]
+        rows = self.rows.get_many([key for key, _ in hits]) if hits else {}
+        out: List[Tuple[SearchResult, float]] = []
+        for key, sim in hits:
+            blob = rows.get(key)
+            if blob is None:
+                continue
+            data = json.loads(blob)
+            result = SearchResult(**data["result"])
+            if data["created_at"] < cutoff or (result.source == "local") != local_source:
+                continue
+            # Rows written before budgets were recorded count as searched without one
+            if not any(budgets_compatible(budget_usd, b, EVIDENCE_BUDGET_TOLERANCE) for b in data.get("budgets", [None])):
+                continue
+            out.append((result, sim))
+        return out
+
+    def clear(self) -> None:
+        with self._build_lock, self._lock:
+            self.rows.clear()
+            self.vectors.clear()
+            self.calibration.clear()
+            self._indexes.clear()
+            self._unsaved.clear()
+            self._samples.clear()
+            if self.path:
+                shutil.rmtree(f"{self.path}.index", ignore_errors=True)
+
+
+evidence_store = EvidenceStore(EVIDENCE_STORE_PATH or None)
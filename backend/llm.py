@@ -1,65 +1,371 @@
 # backend/llm.py
 
 import os
-from typing import List, Any
+import asyncio
+import json
+import threading
+import time
+import weakref
+from typing import TYPE_CHECKING, AsyncIterator, List, Any, Optional, Set, Tuple
 
-from openai import OpenAI
+from .cache import SqliteStore, TTLCache, content_key
+from .config import EMBED_CACHE_MEMORY_ITEMS, EMBED_CACHE_PATH, EMBED_BATCH_LIMIT
+from .config import LLM_CACHE_SITES, LLM_CACHE_TTL_S, LLM_CACHE_MAX_ITEMS, LLM_CACHE_PATH, LLM_CACHE_DB_MAX_ROWS
+from .embed_cache import EmbeddingCache
+from .providers import ChatProvider, ChatResult, EmbedProvider, EmbedResult, chat_provider, embed_provider
+from .tracing import count, current_trace, span
 
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
-# Pulling API key from env first, then Streamlit secrets if running under Streamlit
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-
-try:
-    import streamlit as st
-    OPENAI_API_KEY = st.secrets.get("OPENAI_API_KEY") or OPENAI_API_KEY
-except Exception:
-    pass
-
-if not OPENAI_API_KEY:
-    raise RuntimeError(
-        "OPENAI_API_KEY not set. Add it to .streamlit/secrets.toml "
-        "or set it as an environment variable."
-    )
 
 # Model can be overridden via env var
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 
-_client = OpenAI(api_key=OPENAI_API_KEY)
+_embed_cache = EmbeddingCache(EMBED_CACHE_MEMORY_ITEMS, EMBED_CACHE_PATH or None)
+
+
+class ResponseCache:
+    """
+    LLM responses keyed by (provider, model, system, user, format), kept for ttl_s in an LRU
+    and optionally a SQLite file shared by every worker process (pruned to ttl_s and max_rows).
+    The file is only opened once a call site with caching enabled looks something up.
+    """
+
+    def __init__(self, max_items: int, ttl_s: float, path: Optional[str] = None, max_rows: Optional[int] = None):
+        self.ttl_s = ttl_s
+        self.memory = TTLCache(max_items, ttl_s=ttl_s)
+        self.store = SqliteStore(path, table="llm_responses", max_age_s=ttl_s, max_rows=max_rows) if path else None
+
+    @staticmethod
+    def key(provider: ChatProvider, system: str, user: str, fmt: str) -> str:
+        return content_key(provider.name, provider.model, system, user, fmt)
+
+    def get(self, key: str) -> Optional[str]:
+        hit = self.memory.get(key)
+        if hit is not None:
+            return hit[0]
+        if self.store is None:
+            return None
+
+        row = self.store.get_entry(key)
+        if row is None or time.time() - row[1] > self.ttl_s:
+            return None
+        text = row[0].decode("utf-8")
+        self.memory.put(key, text, created_at=row[1])
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        now = time.time()
+        self.memory.put(key, text, created_at=now)
+        if self.store is not None:
+            self.store.put_many([(key, text.encode("utf-8"))], created_at=now)
+
+    def clear(self) -> None:
+        """Empties the in-memory layer (the SQLite file keeps its entries until they expire)."""
+        self.memory.clear()
+
+
+_response_cache = ResponseCache(LLM_CACHE_MAX_ITEMS, LLM_CACHE_TTL_S, LLM_CACHE_PATH or None, LLM_CACHE_DB_MAX_ROWS)
+_cache_sites: Set[str] = set(LLM_CACHE_SITES)
+
+
+def set_cache_site(site: str, enabled: bool = True) -> None:
+    """Turns response caching on or off for one call site at runtime."""
+    if enabled:
+        _cache_sites.add(site)
+    else:
+        _cache_sites.discard(site)
+
+
+def _cache_key_for(provider: ChatProvider, system: str, user: str, site: Optional[str]) -> Optional[str]:
+    """Response cache key when the call site has caching enabled, else None."""
+    if site is None or not (site in _cache_sites or "all" in _cache_sites):
+        return None
+    return ResponseCache.key(provider, system, user, "json")
+
+
+def _cached_response(key: Optional[str], attrs: dict) -> Optional[str]:
+    if key is None:
+        return None
+    text = _response_cache.get(key)
+    attrs["cache"] = "hit" if text is not None else "miss"
+    count("llm_cache_hits" if text is not None else "llm_cache_misses")
+    return text
+
+
+def _cache_response(key: Optional[str], text: str) -> None:
+    # Only well-formed JSON is kept; a malformed answer is retried next time
+    if key is None:
+        return
+    try:
+        json.loads(text)
+    except ValueError:
+        return
+    _response_cache.put(key, text)
+
+
+def _openai_api_key() -> Optional[str]:
+    """Pulling API key from env first, then Streamlit secrets if running under Streamlit."""
+    key = os.getenv("OPENAI_API_KEY")
+    try:
+        import streamlit as st
+        key = st.secrets.get("OPENAI_API_KEY") or key
+    except Exception:
+        pass
+    return key
+
+
+class _OpenAIClients:
+    """One sync client, plus one async client per event loop (its HTTP pool is tied to the loop)."""
+
+    def __init__(self):
+        api_key = _openai_api_key()
+        if not api_key:
+            raise RuntimeError(
+                "OPENAI_API_KEY not set. Add it to .streamlit/secrets.toml "
+                "or set it as an environment variable."
+            )
+        # Deferred: the openai package takes a few hundred ms to import
+        from openai import AsyncOpenAI, OpenAI
+
+        self._api_key = api_key
+        self._async_cls = AsyncOpenAI
+        self.sync = OpenAI(api_key=api_key)
+        self._async: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def for_loop(self) -> "AsyncOpenAI":
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async.get(loop)
+            if client is None:
+                client = self._async_cls(api_key=self._api_key)
+                self._async[loop] = client
+        return client
+
+
+_clients = None
+_clients_lock = threading.Lock()
+
+
+def _openai_clients() -> _OpenAIClients:
+    """Shared by the chat and embedding providers; built on first use."""
+    global _clients
+    if _clients is not None:
+        return _clients
+    with _clients_lock:
+        if _clients is None:
+            _clients = _OpenAIClients()
+    return _clients
+
+
+def _messages(system: str, user: str) -> List[dict]:
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
+    ]
+
+
+def _usage(resp: Any) -> Tuple[int, int]:
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return 0, 0
+    return getattr(usage, "input_tokens", 0) or 0, getattr(usage, "output_tokens", 0) or 0
 
 
-def llm_json(system: str, user: str) -> str:
-    """Gets a JSON object response as a string."""
-    resp = _client.responses.create(
-        model=OPENAI_MODEL,
-        input=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
-        text={"format": {"type": "json_object"}},
-    )
-    return resp.output_text
+class OpenAIChat(ChatProvider):
+    name = "openai"
+
+    def __init__(self):
+        self.model = OPENAI_MODEL
+        self.clients = _openai_clients()
+
+    def _format(self, json_mode: bool) -> dict:
+        return {"text": {"format": {"type": "json_object"}}} if json_mode else {}
+
+    def complete(self, system: str, user: str, json_mode: bool = False) -> ChatResult:
+        resp = self.clients.sync.responses.create(
+            model=self.model,
+            input=_messages(system, user),
+            **self._format(json_mode),
+        )
+        return ChatResult(resp.output_text, *_usage(resp))
+
+    async def acomplete(self, system: str, user: str, json_mode: bool = False) -> ChatResult:
+        resp = await self.clients.for_loop().responses.create(
+            model=self.model,
+            input=_messages(system, user),
+            **self._format(json_mode),
+        )
+        return ChatResult(resp.output_text, *_usage(resp))
+
+    async def astream(self, system: str, user: str) -> AsyncIterator[ChatResult]:
+        stream = await self.clients.for_loop().responses.create(
+            model=self.model,
+            input=_messages(system, user),
+            stream=True,
+        )
+        async for event in stream:
+            if event.type == "response.output_text.delta":
+                yield ChatResult(event.delta)
+            elif event.type == "response.completed":
+                yield ChatResult("", *_usage(event.response))
+
+
+class OpenAIEmbed(EmbedProvider):
+    name = "openai"
+
+    def __init__(self):
+        # Using a dedicated embedding model env var if provided
+        self.model = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
+        self.clients = _openai_clients()
+
+    @staticmethod
+    def _result(resp: Any) -> EmbedResult:
+        usage = getattr(resp, "usage", None)
+        tokens = (getattr(usage, "total_tokens", 0) or 0) if usage is not None else 0
+        return EmbedResult([item.embedding for item in resp.data], tokens)
+
+    def embed(self, texts: List[str]) -> EmbedResult:
+        return self._result(self.clients.sync.embeddings.create(model=self.model, input=texts))
+
+    async def aembed(self, texts: List[str]) -> EmbedResult:
+        return self._result(await self.clients.for_loop().embeddings.create(model=self.model, input=texts))
+
+
+def _record_usage(attrs: dict, res: ChatResult) -> None:
+    """Copies token usage onto the span and the trace counters."""
+    count("llm_calls")
+    for key, n in (("input_tokens", res.input_tokens), ("output_tokens", res.output_tokens)):
+        attrs[key] = n
+        count(f"llm_{key}", n)
+
+
+def llm_json(system: str, user: str, cache_site: Optional[str] = None) -> str:
+    """
+    Gets a JSON object response as a string.
+    cache_site names the caller; when that site is in LLM_CACHE_SITES, identical inputs are
+    answered from the response cache.
+    """
+    provider = chat_provider()
+    with span("llm.json", provider=provider.name, model=provider.model, site=cache_site) as attrs:
+        key = _cache_key_for(provider, system, user, cache_site)
+        text = _cached_response(key, attrs)
+        if text is not None:
+            return text
+        res = provider.complete(system, user, json_mode=True)
+        _record_usage(attrs, res)
+        _cache_response(key, res.text)
+    return res.text
 
 
 def llm_text(system: str, user: str) -> str:
     """Gets a normal text response as a string."""
-    resp = _client.responses.create(
-        model=OPENAI_MODEL,
-        input=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
-    )
-    return resp.output_text
+    provider = chat_provider()
+    with span("llm.text", provider=provider.name, model=provider.model) as attrs:
+        res = provider.complete(system, user)
+        _record_usage(attrs, res)
+    return res.text
+
+
+async def allm_json(system: str, user: str, cache_site: Optional[str] = None) -> str:
+    """Async llm_json."""
+    provider = chat_provider()
+    with span("llm.json", provider=provider.name, model=provider.model, site=cache_site) as attrs:
+        key = _cache_key_for(provider, system, user, cache_site)
+        text = _cached_response(key, attrs)
+        if text is not None:
+            return text
+        res = await provider.acomplete(system, user, json_mode=True)
+        _record_usage(attrs, res)
+        _cache_response(key, res.text)
+    return res.text
+
+
+async def allm_text(system: str, user: str) -> str:
+    """Async llm_text."""
+    provider = chat_provider()
+    with span("llm.text", provider=provider.name, model=provider.model) as attrs:
+        res = await provider.acomplete(system, user)
+        _record_usage(attrs, res)
+    return res.text
+
+
+async def allm_text_stream(system: str, user: str) -> AsyncIterator[str]:
+    """Like allm_text but yields the response text as it is generated."""
+    provider = chat_provider()
+    t = current_trace()
+    with span("llm.text_stream", provider=provider.name, model=provider.model) as attrs:
+        total = ChatResult("")
+        async for chunk in provider.astream(system, user):
+            total.input_tokens += chunk.input_tokens
+            total.output_tokens += chunk.output_tokens
+            if chunk.text:
+                # Time-to-first-token, measured from the start of the request
+                if t is not None and "first_token_ms" not in attrs:
+                    attrs["first_token_ms"] = round(t.elapsed_ms(), 1)
+                yield chunk.text
+        _record_usage(attrs, total)
+
+
+def _chunks(texts: List[str]) -> List[List[str]]:
+    # The API caps inputs per request; almost always this is a single chunk
+    return [texts[i:i + EMBED_BATCH_LIMIT] for i in range(0, len(texts), EMBED_BATCH_LIMIT)]
+
+
+def _record_embed_usage(res: EmbedResult) -> None:
+    count("embed_api_calls")
+    count("embed_tokens", res.total_tokens)
+
+
+def _embed_uncached(provider: EmbedProvider, texts: List[str]) -> List[List[float]]:
+    out: List[List[float]] = []
+    for chunk in _chunks(texts):
+        res = provider.embed(chunk)
+        _record_embed_usage(res)
+        out.extend(res.vectors)
+    return out
+
+
+async def _aembed_uncached(provider: EmbedProvider, texts: List[str]) -> List[List[float]]:
+    results = await asyncio.gather(*(provider.aembed(c) for c in _chunks(texts)))
+    for res in results:
+        _record_embed_usage(res)
+    return [v for res in results for v in res.vectors]
+
+
+def embed_vectors(texts: List[str]) -> List[Any]:
+    """Like embed_texts but returns float32 NumPy vectors straight from the cache."""
+    provider = embed_provider()
+
+    with span("embed", provider=provider.name, texts=len(texts)) as attrs:
+        def _fetch(miss: List[str]) -> List[List[float]]:
+            attrs["api_texts"] = len(miss)
+            return _embed_uncached(provider, miss)
+
+        # Cache keys include the model, so switching providers never mixes vector spaces
+        vectors = _embed_cache.embed(provider.model, texts, _fetch)
+        count("embed_texts", len(texts))
+        count("embed_cache_hits", len(texts) - attrs.get("api_texts", 0))
+    return vectors
 
 
 def embed_texts(texts: List[str]) -> List[List[float]]:
-    """Embeds a list of strings and returns vectors."""
-    # Using a dedicated embedding model env var if provided
-    embed_model = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
+    """Embeds a list of strings and returns vectors (served from the embedding cache when possible)."""
+    return [v.tolist() for v in embed_vectors(texts)]
+
+
+async def aembed_vectors(texts: List[str]) -> List[Any]:
+    """Async embed_vectors."""
+    provider = embed_provider()
 
-    resp = _client.embeddings.create(
-        model=embed_model,
-        input=texts,
-    )
+    with span("embed", provider=provider.name, texts=len(texts)) as attrs:
+        async def _fetch(miss: List[str]) -> List[List[float]]:
+            attrs["api_texts"] = len(miss)
+            return await _aembed_uncached(provider, miss)
 
-    return [item.embedding for item in resp.data]
+        vectors = await _embed_cache.aembed(provider.model, texts, _fetch)
+        count("embed_texts", len(texts))
+        count("embed_cache_hits", len(texts) - attrs.get("api_texts", 0))
+    return vectors
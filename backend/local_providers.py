@@ -0,0 +1,169 @@
+# backend/local_providers.py
+#
+# Deterministic, offline providers: a canned-JSON chat model that answers every prompt
+# the pipeline sends, a hashing embedder and a synthetic search engine. Selected with
+# GIFTBOT_CHAT_PROVIDER=local / GIFTBOT_EMBED_PROVIDER=local / GIFTBOT_SEARCH_PROVIDER=local
+# for load tests and CI perf runs.
+
+import hashlib
+import json
+import re
+from typing import AsyncIterator, List
+
+from .config import MAX_RESULTS_PER_QUERY
+from .models import SearchResult
+from .prompts import QUERY_PLANNER, IDEA_EXTRACTOR, BUY_LINK_FINDER, CARD_WRITER
+from .providers import ChatProvider, ChatResult, EmbedProvider, EmbedResult, SearchProvider
+
+EMBED_DIM = 256
+
+_URL_RE = re.compile(r"https?://\S+")
+_TOKEN_RE = re.compile(r"[a-z0-9$]+")
+
+_IDEA_NOUNS = [
+    "journal", "candle set", "tea sampler", "star map", "planter", "photo book",
+    "cookbook", "blanket", "puzzle", "mug set", "tote bag", "desk lamp",
+]
+
+
+def _hash(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def prompt_kind(system: str, user: str) -> str:
+    """Which pipeline step a prompt belongs to."""
+    if QUERY_PLANNER.strip()[:40] in user:
+        return "plan_queries"
+    if IDEA_EXTRACTOR.strip()[:40] in user:
+        return "extract_ideas"
+    if BUY_LINK_FINDER.strip()[:40] in user:
+        return "buy_link_queries"
+    if CARD_WRITER.strip()[:40] in user:
+        return "cards"
+    if "JSON extractor" in system:
+        return "profile_parser"
+    return "other"
+
+
+def canned_response(system: str, user: str) -> str:
+    """Plausible, deterministic output for each prompt the pipeline sends."""
+    kind = prompt_kind(system, user)
+    seed = int(_hash(user)[:8], 16)
+
+    if kind == "plan_queries":
+        profile = re.findall(r"^(\w+): (.+)$", user, flags=re.M)
+        facts = " ".join(v for k, v in profile if k in ("relationship", "interests", "occasion"))[:80]
+        budget = next((v for k, v in profile if k == "budget_usd"), "")
+        tail = f" under ${budget}" if budget else ""
+        return json.dumps({"queries": [
+            f"best gifts {facts}{tail}",
+            f"unique gift ideas {facts}",
+            f"site:pinterest.com {facts} gift ideas",
+            f"site:pinterest.com aesthetic gifts {facts}",
+            f"site:etsy.com personalized gift {facts}",
+            f"site:etsy.com handmade {facts}{tail}",
+        ]})
+
+    if kind == "extract_ideas":
+        m = re.search(r"produce (\d+) gift ideas", user)
+        k = int(m.group(1)) if m else 5
+        urls = _URL_RE.findall(user)
+        ideas = []
+        for i in range(k):
+            noun = _IDEA_NOUNS[(seed + i) % len(_IDEA_NOUNS)]
+            j = i % len(urls) if urls else 0
+            ideas.append({
+                "name": f"Personalized {noun} #{(seed + i) % 97}",
+                "why_it_fits": f"Matches the profile; popular on Pinterest and Etsy ({noun}).",
+                "estimated_price": "$25-$45",
+                "evidence_urls": urls[j:j + 2],
+            })
+        return json.dumps({"ideas": ideas})
+
+    if kind == "buy_link_queries":
+        names = re.findall(r"^- (.+?)(?: \[etsy\])?$", user, flags=re.M)
+        return json.dumps({n: [f"{n} buy", f"site:etsy.com {n}", f"{n} amazon"] for n in names})
+
+    if kind == "cards":
+        return (
+            "a one-line note: Thought of you the moment I saw these.\n"
+            "a heartfelt short card: Happy day!\nYou make every season brighter.\nWith love.\n"
+            "a professional gifting writeup: A small token of appreciation for your hard work this year."
+        )
+
+    if kind == "profile_parser":
+        budget = re.search(r"\$(\d+)", user)
+        return json.dumps({
+            "relationship": "", "age": None, "personality": "", "interests": "", "occasion": "",
+            "budget_usd": float(budget.group(1)) if budget else None, "exclude_ideas": [], "extra": "",
+        })
+
+    return json.dumps({})
+
+
+def hashing_embedding(text: str, dim: int = EMBED_DIM) -> List[float]:
+    """Signed bag-of-words hashing, so texts sharing words get similar vectors."""
+    vec = [0.0] * dim
+    for tok in _TOKEN_RE.findall(text.lower()):
+        h = int(hashlib.md5(tok.encode("utf-8")).hexdigest()[:8], 16)
+        vec[h % dim] += 1.0 if (h >> 16) & 1 else -1.0
+    return vec
+
+
+def synthetic_results(query: str, n: int = MAX_RESULTS_PER_QUERY) -> List[SearchResult]:
+    seed = _hash(query)[:10]
+    if "etsy" in query:
+        site = "www.etsy.com/listing"
+    elif "pinterest" in query:
+        site = "www.pinterest.com/pin"
+    else:
+        site = "www.amazon.com/dp"
+    return [
+        SearchResult(
+            title=f"{query.replace('site:', '')[:60]} - result {i}",
+            url=f"https://{site}/{seed}{i}",
+            snippet=f"{query} ... rated {3.5 + (i % 3) * 0.5:.1f} out of 5 stars",
+            source="local",
+        )
+        for i in range(n)
+    ]
+
+
+def _approx_tokens(text: str) -> int:
+    return len(text) // 4
+
+
+class LocalChat(ChatProvider):
+    name = "local"
+    model = "local-canned"
+
+    def complete(self, system: str, user: str, json_mode: bool = False) -> ChatResult:
+        out = canned_response(system, user)
+        return ChatResult(out, _approx_tokens(system + user), _approx_tokens(out))
+
+    async def acomplete(self, system: str, user: str, json_mode: bool = False) -> ChatResult:
+        return self.complete(system, user, json_mode)
+
+    async def astream(self, system: str, user: str) -> AsyncIterator[ChatResult]:
+        res = self.complete(system, user)
+        for word in res.text.split(" "):
+            yield ChatResult(word + " ")
+        yield ChatResult("", res.input_tokens, res.output_tokens)
+
+
+class HashingEmbed(EmbedProvider):
+    name = "local"
+    model = f"local-hash-{EMBED_DIM}"
+
+    def embed(self, texts: List[str]) -> EmbedResult:
+        return EmbedResult([hashing_embedding(t) for t in texts], sum(_approx_tokens(t) for t in texts))
+
+    async def aembed(self, texts: List[str]) -> EmbedResult:
+        return self.embed(texts)
+
+
+class LocalSearch(SearchProvider):
+    name = "local"
+
+    def search(self, query: str) -> List[SearchResult]:
+        return synthetic_results(query)
@@ -19,7 +19,7 @@ class SearchResult(BaseModel):
     title: str
     url: str
     snippet: str = ""
-    source: Literal["tavily", "duckduckgo"]
+    source: Literal["tavily", "duckduckgo", "local"]
 
 
 class GiftIdea(BaseModel):
@@ -34,3 +34,13 @@ class GiftIdea(BaseModel):
 class GiftBatch(BaseModel):
     ideas: List[GiftIdea]
     search_notes: str = ""
+    reserve: List[GiftIdea] = Field(default_factory=list, description="Ranked candidates not shown yet")
+
+
+class BatchEvent(BaseModel):
+    """One step of a streamed batch: an idea is ranked, its buy link resolves, card text arrives, or all is done."""
+    kind: Literal["idea", "buy_link", "cards_delta", "done"]
+    index: Optional[int] = None
+    idea: Optional[GiftIdea] = None
+    text: str = ""
+    batch: Optional[GiftBatch] = None
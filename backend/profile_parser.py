@@ -1,9 +1,12 @@
 # backend/profile_parser.py
 
 import json
-from typing import Any, Dict
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
 
+from .config import PROFILE_PARSER_MIN_CONFIDENCE
 from .llm import llm_json
+from .tracing import count
 
 SYSTEM_PROFILE_EXTRACTOR = """
 You are a strict JSON extractor. Convert the user's gifting request into a compact profile JSON.
@@ -24,17 +27,368 @@ Rules:
 - budget_usd must be a number (e.g., "$50 max" -> 50).
 """
 
-def profile_from_prompt(prompt: str) -> Dict[str, Any]:
-    raw = llm_json(SYSTEM_PROFILE_EXTRACTOR, prompt)
+# Local extraction: each field gets (value, confidence). A field is settled when its confidence
+# reaches PROFILE_PARSER_MIN_CONFIDENCE, or when the text has no cue for it at all (then it is
+# simply absent); only fields with a cue but no confident value are asked of the LLM.
+# Confidence drops to _AMBIGUOUS whenever the text could be read more than one way (conflicting
+# values, long or vague captures, an item that is both liked and excluded).
+Extracted = Dict[str, Tuple[Any, float]]
+
+_RELATIONSHIPS = {
+    "mom": "mom", "mother": "mom", "mum": "mom", "dad": "dad", "father": "dad",
+    "sister": "sister", "brother": "brother", "wife": "wife", "husband": "husband",
+    "partner": "partner", "girlfriend": "girlfriend", "boyfriend": "boyfriend",
+    "fiance": "fiance", "fiancee": "fiancee", "best friend": "best friend", "friend": "friend",
+    "coworker": "coworker", "co-worker": "coworker", "colleague": "coworker", "boss": "boss",
+    "manager": "boss", "teacher": "teacher", "grandma": "grandmother", "grandmother": "grandmother",
+    "grandpa": "grandfather", "grandfather": "grandfather", "son": "son", "daughter": "daughter",
+    "niece": "niece", "nephew": "nephew", "aunt": "aunt", "uncle": "uncle", "cousin": "cousin",
+    "neighbor": "neighbor", "roommate": "roommate", "client": "client", "in-law": "in-law",
+}
+_OCCASIONS = {
+    "birthday": "birthday", "bday": "birthday", "christmas": "Christmas", "xmas": "Christmas",
+    "hanukkah": "Hanukkah", "anniversary": "anniversary", "mother's day": "Mother's Day",
+    "mothers day": "Mother's Day", "father's day": "Father's Day", "fathers day": "Father's Day",
+    "valentine's": "Valentine's Day", "valentines": "Valentine's Day", "graduation": "graduation",
+    "housewarming": "housewarming", "wedding": "wedding", "engagement": "engagement",
+    "baby shower": "baby shower", "bridal shower": "bridal shower", "retirement": "retirement",
+    "farewell": "farewell", "going away": "farewell", "promotion": "promotion",
+    "thank you": "thank you", "get well": "get well", "secret santa": "Secret Santa",
+    "white elephant": "white elephant", "holiday": "holiday", "teacher appreciation": "teacher appreciation",
+}
+_PERSONALITY = {
+    "minimalist", "sentimental", "practical", "playful", "creative", "outdoorsy", "adventurous",
+    "nerdy", "geeky", "sporty", "artsy", "introverted", "extroverted", "funny", "cozy", "stylish",
+    "classy", "quirky", "organized", "techy", "bookish", "romantic", "trendy", "homebody",
+}
+
+
+def _alternation(words) -> str:
+    # Longest first, so "best friend" wins over "friend"
+    return "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+
+
+_RELATIONSHIP_RE = re.compile(rf"\b({_alternation(_RELATIONSHIPS)})s?\b")
+# "my sister's husband", "my boyfriend's mom", "mother-in-law": the first word isn't the recipient
+_POSSESSIVE_RELATIONSHIP_RE = re.compile(
+    rf"\b(?:{_alternation(_RELATIONSHIPS)})'s\s+(?:\w+\s+)?({_alternation(_RELATIONSHIPS)})\b"
+)
+_IN_LAW_RE = re.compile(r"\b([a-z]+)[- ]in[- ]laws?\b")
+_FOR_RELATIONSHIP_RE = re.compile(rf"\b(?:for|to)\s+(?:my|our|a|an|the)\s+(?:\w+\s+)?({_alternation(_RELATIONSHIPS)})\b")
+_OCCASION_RE = re.compile(rf"\b({_alternation(_OCCASIONS)})\b")
+_PERSONALITY_RE = re.compile(rf"\b({_alternation(_PERSONALITY)})\b")
+
+_AMOUNT = r"(\d{1,5}(?:\.\d{1,2})?)"
+_MONEY_RE = re.compile(rf"\$\s*{_AMOUNT}(?:\s*(?:-|to)\s*\$?\s*{_AMOUNT})?")
+_MONEY_WORDS_RE = re.compile(rf"\b{_AMOUNT}\s*(?:dollars|bucks|usd)\b")
+# Units that make a number something other than an age or a budget ("6 feet", "5'4", "2 hours", "3 items")
+_UNITS = (
+    r"(?:'|\"|feet|foot|ft|inch\w*|in\b|cm|meters?|kg|kilos?|lbs?|pounds?|hours?|hrs?|minutes?|mins?|"
+    r"days?|weeks?|months?|items?|things|pieces?|people|kids|%|percent|[.,:/]\d)"
+)
+# A bare number is only a budget after a budget word ("budget of 50", "spend around 40")
+_BUDGET_NUMBER_RE = re.compile(
+    rf"\b(?:budget|spend|spending)\s*(?:is|of|:|limit|around|about|up to|under|max|maximum|at most)?\s*{_AMOUNT}\b"
+    rf"(?!\s*{_UNITS})"
+)
+
+_AGE_RES = [
+    (re.compile(r"\b(\d{1,3})[\s-]*(?:years?|yrs?|yr)[\s-]*old\b"), 0.95),
+    (re.compile(r"\b(?:aged?|turning|turns|age of)\s+(\d{1,3})\b"), 0.9),
+    (re.compile(r"\b(\d{1,2})\s*(?:yo|y/o|y\.o\.)\b"), 0.9),
+    # "my son who is 8", "she's 12" (not "budget is 50": the subject has to be a person;
+    # not "he's 6 feet tall" or "she is 5'4")
+    (re.compile(
+        rf"\b(?:who|she|he|they|{_alternation(_RELATIONSHIPS)})\s*(?:is|'s|are|just turned)\s+(\d{{1,3}})\b"
+        rf"(?!\s*(?:\$|dollars|bucks|usd|{_UNITS}))"
+    ), 0.85),
+]
+# "in her 30s" -> 35, "in his early 20s" -> 22
+_DECADE_RE = re.compile(r"\bin\s+(?:his|her|their)\s+(?:(early|mid|late)\s+)?(\d)0s\b")
+_DECADE_OFFSETS = {"early": 2, "mid": 5, "late": 8, None: 5}
+# Rough ages for life-stage words; below the confidence bar, so they only hint (the LLM decides)
+_AGE_WORDS = {"newborn": 0, "baby": 1, "toddler": 2, "teen": 15, "teenager": 15, "college student": 20, "retiree": 67}
+_AGE_WORDS_RE = re.compile(rf"\b({_alternation(_AGE_WORDS)})\b(?!\s+shower)")
+_AGE_WORD_CONFIDENCE = 0.6
+
+_NO_GO_RE = re.compile(
+    r"\b(?:no|avoid(?:ing)?|nothing|without|hates?|dislikes?|allergic to|not into)\s+"
+    r"([a-z][a-z' -]*?)(?=\s*(?:[,.;!?]|\bbut\b|\bplease\b|$))"
+)
+_NO_GO_SUFFIX_RE = re.compile(r"\b([a-z][a-z' ]*?)\s+(?:is|are)\s+(?:a\s+)?(?:no[- ]go|off[- ]limits|out)\b")
+_NO_GO_IGNORE = {"idea", "ideas", "clue", "budget", "limit", "rush", "preference", "preferences", "one", "more", "longer"}
+# "nothing too personal", "no overly expensive stuff": a quality to avoid rather than an item
+_VAGUE_RE = re.compile(r"^(?:too|overly|very|so|super|really|that|anything|something|stuff|things?)\b")
+
+_INTERESTS_RE = re.compile(
+    r"\b(?:loves?|likes?|enjoys?|is into|are into|into|fan of|obsessed with|passionate about|"
+    r"interested in|hobbies (?:are|include)|hobby is)\s+([^.;!?]+)"
+)
+_INTEREST_STOP_RE = re.compile(
+    r"\b(?:but|who|which|so|because|and (?:she|he|they|i|we)|she|he|they|loves?|likes?|enjoys?)\b"
+)
+# Negation right before an interest verb ("not into", "doesn't like", "not a big fan of")
+_NEGATED_RE = re.compile(r"(?:\bnot|n't|\bnever|\bno longer)\s+(?:(?:really|very|much|that|a|big|huge)\s+)*$")
+# A comma clause that moves on to the budget or to no-gos ends an interests list
+_CLAUSE_STOP_RE = re.compile(
+    r"^(?:\$|\d|(?:no|not|nothing|never|avoid\w*|without|hates?|dislikes?|allergic|budget|under|max|"
+    r"maximum|up to|spend|around|about|less than|i|we|it)\b)"
+)
+# So does one about when ("birthday next week", "christmas is coming", "party on friday")
+_TIME_RE = re.compile(
+    r"\b(?:next|this|last|coming)\s+(?:week\w*|month|year|\w+day)\b|\b(?:tomorrow|tonight|today|soon)\b|"
+    r"\bin\s+\d+\s+(?:days?|weeks?|months?)\b|\bon\s+(?:mon|tues|wednes|thurs|fri|satur|sun)day\b"
+)
+_OCCASION_CLAUSE_RE = re.compile(
+    rf"^(?:(?:her|his|their|my|our|the|it's|its)\s+)?(?:{_alternation(_OCCASIONS)})\b"
+    r"(?:\s+(?:is|was|party|coming|gift|present|next|this|on|in)\b|$)"
+)
+_SPLIT_RE = re.compile(r"\s*(?:,|/|\band\b|&|\bor\b)\s*")
+_CLAUSE_RE = re.compile(r"\s*[,.;!?]+\s*")
+_FILLER_RE = re.compile(r"\b(?:gifts?|presents?|ideas?|suggestions?|recommend\w*|help|looking for|need|want)\b")
+
+# Words that show a field is being talked about, even when the local patterns can't pin it down
+_CUES = {
+    "budget_usd": re.compile(
+        r"\$|\bbudget\b|\bdollars?\b|\bbucks\b|\bspend\b|\bafford\b|\bcheap\b|\bprice\b|"
+        r"\b(?:under|max|maximum|up to|less than)\s+\d"
+    ),
+    "age": re.compile(
+        r"\b(?:age|aged|years?|yrs|old|young|teen\w*|toddler|baby|kid|\d0s)\b|\b(?:who|she|he|they)(?:\s+is|'s|\s+are)\s+\d"
+    ),
+    "occasion": re.compile(r"\b(?:day|party|celebrat\w*|occasion|shower|ceremony|festival|season)\b"),
+    "relationship": re.compile(r"\b(?:my|our)\s+[a-z]+"),
+    "exclude_ideas": re.compile(r"\b(?:no|avoid\w*|nothing|without|hates?|dislikes?|allergic|no-go|off[- ]limits)\b"),
+    "interests": re.compile(r"\b(?:loves?|likes?|enjoys?|into|fan|obsessed|passionate|interested|hobb\w+)\b"),
+    "personality": re.compile(r"\bpersonality\b|\b(?:is|she's|he's|they're)\s+(?:very|super|really|quite|pretty)\s+(?!into\b)\w+"),
+}
+_FIELDS = ["relationship", "age", "personality", "interests", "occasion", "budget_usd", "exclude_ideas", "extra"]
+
+
+_AMBIGUOUS = 0.5
+
+
+def _clean_item(text: str) -> str:
+    return " ".join(text.strip(" '-").split())
+
+
+def _distinct(values: List[str]) -> List[str]:
+    out: List[str] = []
+    for v in values:
+        if v not in out:
+            out.append(v)
+    return out
+
+
+def _budget(text: str) -> Tuple[Optional[float], float]:
+    amounts = []
+    for m in _MONEY_RE.finditer(text):
+        # A range like "$30-$50" means the top of it is the budget
+        amounts.append(float(m.group(2) or m.group(1)))
+    if amounts:
+        return amounts[0], 0.95 if len(set(amounts)) == 1 else _AMBIGUOUS
+    m = _MONEY_WORDS_RE.search(text) or _BUDGET_NUMBER_RE.search(text)
+    if m:
+        return float(m.group(1)), 0.85
+    return None, 0.0
+
+
+def _age(text: str) -> Tuple[Optional[int], float]:
+    found = [(int(m.group(1)), confidence) for pattern, confidence in _AGE_RES for m in pattern.finditer(text)]
+    found += [(int(m.group(2)) * 10 + _DECADE_OFFSETS[m.group(1)], 0.85) for m in _DECADE_RE.finditer(text)]
+    if found:
+        # Two different ages ("my 8 year old and her 12 year old cousin") need a reader
+        return found[0][0], found[0][1] if len({v for v, _ in found}) == 1 else _AMBIGUOUS
+    m = _AGE_WORDS_RE.search(text)
+    if m:
+        return _AGE_WORDS[m.group(1)], _AGE_WORD_CONFIDENCE
+    return None, 0.0
+
+
+def _occasion(text: str) -> Tuple[str, float]:
+    found = _distinct([_OCCASIONS[m] for m in _OCCASION_RE.findall(text)])
+    if not found:
+        return "", 0.0
+    return found[0], 0.9 if len(found) == 1 else _AMBIGUOUS
+
+
+def _relationship(text: str) -> Tuple[str, float]:
+    m = _IN_LAW_RE.search(text)
+    if m:
+        return f"{m.group(1)}-in-law", _AMBIGUOUS
+    m = _POSSESSIVE_RELATIONSHIP_RE.search(text)
+    if m:
+        return _RELATIONSHIPS[m.group(1)], _AMBIGUOUS
+    m = _FOR_RELATIONSHIP_RE.search(text)
+    if m:
+        return _RELATIONSHIPS[m.group(1)], 0.95
+    found = _distinct([_RELATIONSHIPS[m] for m in _RELATIONSHIP_RE.findall(text)])
+    if not found:
+        return "", 0.0
+    return found[0], 0.85 if len(found) == 1 else _AMBIGUOUS
+
+
+def _personality(text: str) -> Tuple[str, float]:
+    found = _distinct(_PERSONALITY_RE.findall(text))
+    return (", ".join(found), 0.85) if found else ("", 0.0)
+
+
+def _exclude_ideas(text: str) -> Tuple[List[str], float]:
+    items: List[str] = []
+    for phrase in _NO_GO_RE.findall(text) + _NO_GO_SUFFIX_RE.findall(text):
+        # "hates jewelry and perfume" is two items; "no candles and she loves tea" stops at "she"
+        phrase = _INTEREST_STOP_RE.split(phrase, maxsplit=1)[0]
+        items.extend(_clean_item(x) for x in _SPLIT_RE.split(phrase))
+    items = _distinct([x for x in items if x and x.split()[0] not in _NO_GO_IGNORE])
+    if not items:
+        return [], 0.0
+    # Long captures are usually a sentence rather than an item ("no idea what she would like"),
+    # and "too personal" is a quality, not something to search for
+    vague = any(len(x.split()) > 3 or _VAGUE_RE.match(x) for x in items)
+    return items, _AMBIGUOUS if vague else 0.9
+
+
+def _interest_phrases(text: str) -> List[str]:
+    """Text after each interest verb that isn't negated, cut at the next clause or verb."""
+    phrases: List[str] = []
+    pos = 0
+    while True:
+        m = _INTERESTS_RE.search(text, pos)
+        if m is None:
+            return phrases
+        # Searching again from the captured text, so a later verb in it gets its own match
+        pos = m.start(1)
+        if _NEGATED_RE.search(text[max(0, m.start() - 40):m.start()]):
+            continue
+        kept: List[str] = []
+        for clause in _SPLIT_RE.split(_INTEREST_STOP_RE.split(m.group(1), maxsplit=1)[0]):
+            clause = clause.strip()
+            if _ends_interests(clause):
+                break
+            kept.append(clause)
+        phrases.append(", ".join(kept))
+
+
+def _ends_interests(clause: str) -> bool:
+    """A clause that turns to the budget, no-gos, the occasion or the date ends an interests list."""
+    return bool(
+        _CLAUSE_STOP_RE.match(clause) or _MONEY_RE.search(clause) or _NO_GO_SUFFIX_RE.search(clause)
+        or _TIME_RE.search(clause) or _OCCASION_CLAUSE_RE.match(clause)
+    )
+
+
+def _interests(text: str) -> Tuple[str, float]:
+    items: List[str] = []
+    for phrase in _interest_phrases(text):
+        items.extend(x for x in (_clean_item(s) for s in _SPLIT_RE.split(phrase)) if x)
+    items = _distinct(items)
+    if not items:
+        return "", 0.0
+    ambiguous = any(len(x.split()) > 3 or re.search(r"\d", x) for x in items)
+    return ", ".join(items), _AMBIGUOUS if ambiguous else 0.85
+
+
+def _extra(prompt: str) -> str:
+    """Clauses no field pattern or cue touches ("she just moved to Denver"), as free-text notes."""
+    patterns = [
+        _RELATIONSHIP_RE, _OCCASION_RE, _PERSONALITY_RE, _MONEY_RE, _MONEY_WORDS_RE, _BUDGET_NUMBER_RE,
+        _AGE_WORDS_RE, _DECADE_RE, _NO_GO_RE, _NO_GO_SUFFIX_RE, _INTERESTS_RE, _FILLER_RE,
+        *(p for p, _ in _AGE_RES), *_CUES.values(),
+    ]
+    text = " ".join((prompt or "").split())
+    lower = text.lower()
+    if len(lower) != len(text):
+        text = lower
+    # Characters inside any match; a clause is a note only if none of its characters are
+    covered = bytearray(len(lower))
+    for pattern in patterns:
+        for m in pattern.finditer(lower):
+            covered[m.start():m.end()] = b"\1" * (m.end() - m.start())
+    notes: List[str] = []
+    start = 0
+    for sep in [*_CLAUSE_RE.finditer(text), None]:
+        end = sep.start() if sep else len(text)
+        if end > start and not any(covered[start:end]):
+            notes.append(text[start:end])
+        start = sep.end() if sep else end
+    return "; ".join(notes)
+
+
+def local_profile(prompt: str) -> Extracted:
+    """(value, confidence) per profile field, from patterns and keyword tables only."""
+    text = " ".join((prompt or "").lower().replace("\u2019", "'").split())
+    extracted = {
+        "relationship": _relationship(text),
+        "age": _age(text),
+        "personality": _personality(text),
+        "interests": _interests(text),
+        "occasion": _occasion(text),
+        "budget_usd": _budget(text),
+        "exclude_ideas": _exclude_ideas(text),
+    }
+    # Something both liked and excluded means one of the two readings is wrong
+    (interests, i_conf), (excluded, e_conf) = extracted["interests"], extracted["exclude_ideas"]
+    if set(interests.split(", ")) & set(excluded):
+        extracted["interests"] = (interests, min(i_conf, _AMBIGUOUS))
+        extracted["exclude_ideas"] = (excluded, min(e_conf, _AMBIGUOUS))
+    return extracted
+
+
+def unresolved_fields(prompt: str, extracted: Extracted, min_confidence: float = PROFILE_PARSER_MIN_CONFIDENCE) -> Set[str]:
+    """Fields the text talks about that local extraction could not settle with enough confidence."""
+    text = " ".join((prompt or "").lower().split())
+    return {
+        name for name, (_, confidence) in extracted.items()
+        if confidence < min_confidence and (confidence > 0 or _CUES[name].search(text))
+    }
+
+
+def _llm_profile(prompt: str, fields: Set[str]) -> Dict[str, Any]:
+    wanted = ", ".join(f for f in _FIELDS if f in fields)
+    raw = llm_json(SYSTEM_PROFILE_EXTRACTOR, f"{prompt}\n\nFields still needed: {wanted}", cache_site="profile_parser")
 
     try:
         data = json.loads(raw)
     except Exception:
         data = {}
+    return data if isinstance(data, dict) else {}
+
+
+def _as_age(value: Any) -> Optional[int]:
+    """A whole-number age, or None for anything else ("teen", "30s", "")."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value) if 0 <= value < 130 else None
+    if isinstance(value, str) and value.strip().isdigit():
+        return _as_age(int(value))
+    return None
+
+
+def profile_from_prompt(prompt: str) -> Dict[str, Any]:
+    """
+    Profile fields from a free-text gifting request. Local patterns fill what they can;
+    llm_json is only called when some field is mentioned but not confidently resolved,
+    and then only those fields are taken from its answer.
+    """
+    extracted = local_profile(prompt)
+    needed = unresolved_fields(prompt, extracted)
+    data: Dict[str, Any] = {
+        name: value for name, (value, confidence) in extracted.items()
+        if confidence >= PROFILE_PARSER_MIN_CONFIDENCE
+    }
+    if needed:
+        count("profile_parser_llm")
+        llm_data = _llm_profile(prompt, needed)
+        data.update({name: llm_data.get(name) for name in needed})
+        data["extra"] = llm_data.get("extra", "") or _extra(prompt)
+    else:
+        count("profile_parser_local")
+        data["extra"] = _extra(prompt)
 
     profile = {
         "relationship": data.get("relationship", "") or "",
-        "age": data.get("age", None),
+        "age": _as_age(data.get("age")),
         "personality": data.get("personality", "") or "",
         "interests": data.get("interests", "") or "",
         "occasion": data.get("occasion", "") or "",
@@ -36,9 +36,9 @@ Return JSON only matching the schema.
 """
 
 BUY_LINK_FINDER = """
-Given a gift idea name, generate 3-5 web search queries that would find a direct purchase page.
-Prefer reputable US retailers and brand stores. If Etsy listing URLs exist in evidence, include those too.
-Return queries as a JSON array of strings.
+For each gift idea below, generate 3-5 web search queries that would find a direct purchase page.
+Prefer reputable US retailers and brand stores. For ideas marked [etsy], Etsy listings exist in evidence; include an Etsy query.
+Return a JSON object mapping each idea name, exactly as written, to its JSON array of query strings.
 """
 
 CARD_WRITER = """
@@ -0,0 +1,162 @@
+# backend/providers.py
+#
+# Pluggable backends for chat, embeddings and search.
+# Each kind has named factories; the active one comes from config
+# (GIFTBOT_CHAT_PROVIDER / GIFTBOT_EMBED_PROVIDER / GIFTBOT_SEARCH_PROVIDER) unless
+# overridden at runtime with select(). Instances are built on first use and reused.
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Tuple
+
+from .config import CHAT_PROVIDER, EMBED_PROVIDER, SEARCH_PROVIDER, TAVILY_API_KEY
+from .models import SearchResult
+
+
+@dataclass
+class ChatResult:
+    text: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+
+@dataclass
+class EmbedResult:
+    vectors: List[List[float]] = field(default_factory=list)
+    total_tokens: int = 0
+
+
+class ChatProvider:
+    """Text/JSON completion. Streams yield ChatResult chunks; token counts may come on the last one."""
+
+    name = "base"
+    model = ""
+
+    def complete(self, system: str, user: str, json_mode: bool = False) -> ChatResult:
+        raise NotImplementedError
+
+    async def acomplete(self, system: str, user: str, json_mode: bool = False) -> ChatResult:
+        raise NotImplementedError
+
+    async def astream(self, system: str, user: str) -> AsyncIterator[ChatResult]:
+        res = await self.acomplete(system, user)
+        yield res
+
+
+class EmbedProvider:
+    """Embeddings for a batch of texts (the caller handles caching and batch-size limits)."""
+
+    name = "base"
+    model = ""
+
+    def embed(self, texts: List[str]) -> EmbedResult:
+        raise NotImplementedError
+
+    async def aembed(self, texts: List[str]) -> EmbedResult:
+        raise NotImplementedError
+
+
+class SearchProvider:
+    """Blocking web search; search_providers.search_web adds caching and concurrency on top."""
+
+    name = "base"
+
+    def search(self, query: str) -> List[SearchResult]:
+        raise NotImplementedError
+
+
+def _openai_chat() -> ChatProvider:
+    from .llm import OpenAIChat
+    return OpenAIChat()
+
+
+def _openai_embed() -> EmbedProvider:
+    from .llm import OpenAIEmbed
+    return OpenAIEmbed()
+
+
+def _local_chat() -> ChatProvider:
+    from .local_providers import LocalChat
+    return LocalChat()
+
+
+def _local_embed() -> EmbedProvider:
+    from .local_providers import HashingEmbed
+    return HashingEmbed()
+
+
+def _local_search() -> SearchProvider:
+    from .local_providers import LocalSearch
+    return LocalSearch()
+
+
+def _tavily_search() -> SearchProvider:
+    from .search_providers import TavilySearch
+    return TavilySearch()
+
+
+def _duckduckgo_search() -> SearchProvider:
+    from .search_providers import DuckDuckGoSearch
+    return DuckDuckGoSearch()
+
+
+_factories: Dict[str, Dict[str, Callable[[], Any]]] = {
+    "chat": {"openai": _openai_chat, "local": _local_chat},
+    "embed": {"openai": _openai_embed, "local": _local_embed},
+    "search": {"tavily": _tavily_search, "duckduckgo": _duckduckgo_search, "local": _local_search},
+}
+_configured: Dict[str, str] = {"chat": CHAT_PROVIDER, "embed": EMBED_PROVIDER, "search": SEARCH_PROVIDER}
+_selected: Dict[str, str] = {}
+_instances: Dict[Tuple[str, str], Any] = {}
+_lock = threading.Lock()
+
+
+def register(kind: str, name: str, factory: Callable[[], Any]) -> None:
+    """Adds (or replaces) a named provider factory for 'chat', 'embed' or 'search'."""
+    with _lock:
+        _factories[kind][name] = factory
+        _instances.pop((kind, name), None)
+
+
+def select(kind: str, name: str) -> None:
+    """Overrides the configured provider for this process (e.g. benchmarks)."""
+    if name not in _factories[kind] and not (kind == "search" and name == "auto"):
+        raise ValueError(f"Unknown {kind} provider: {name!r}")
+    with _lock:
+        _selected[kind] = name
+
+
+def selected_name(kind: str) -> str:
+    name = _selected.get(kind) or _configured[kind]
+    if kind == "search" and name == "auto":
+        # Tavily when a key exists, otherwise DuckDuckGo
+        return "tavily" if TAVILY_API_KEY else "duckduckgo"
+    return name
+
+
+def get(kind: str) -> Any:
+    name = selected_name(kind)
+    inst = _instances.get((kind, name))
+    if inst is not None:
+        return inst
+    with _lock:
+        inst = _instances.get((kind, name))
+        if inst is None:
+            factory = _factories[kind].get(name)
+            if factory is None:
+                raise ValueError(f"Unknown {kind} provider: {name!r}")
+            inst = factory()
+            _instances[(kind, name)] = inst
+    return inst
+
+
+def chat_provider() -> ChatProvider:
+    return get("chat")
+
+
+def embed_provider() -> EmbedProvider:
+    return get("embed")
+
+
+def search_provider() -> SearchProvider:
+    return get("search")
@@ -0,0 +1,71 @@
+# backend/query_planner.py
+#
+# Template query planner: the same mix the QUERY_PLANNER prompt asks the LLM for (2 broad,
+# 2 site:pinterest.com, 2 site:etsy.com, with budget and occasion) built straight from the
+# GiftProfile fields, with no model call.
+
+import re
+from typing import Any, List
+
+from .models import GiftProfile
+
+_SPLIT_RE = re.compile(r"\s*[,;/]\s*|\s+and\s+")
+_POSSESSIVE_RE = re.compile(r"^(?:my|our|a|an|the)\s+", re.I)
+
+
+def _clean(text: Any) -> str:
+    # Form values may be numbers (the app's age field is a number input)
+    text = "" if text is None else str(text)
+    return " ".join(text.split()).strip(" .!")
+
+
+def _items(text: Any, n: int) -> List[str]:
+    return [x for x in (_clean(s) for s in _SPLIT_RE.split(_clean(text))) if x][:n]
+
+
+def _usd(amount: float) -> str:
+    # "$50", "$49.99", "$1,500,000" (":g" gives "$1.5e+06" and rounds to 6 digits)
+    text = f"{float(amount):,.2f}"
+    return "$" + (text[:-3] if text.endswith(".00") else text)
+
+
+def _who(profile: GiftProfile) -> str:
+    who = _clean(profile.relationship or "") or _clean(profile.recipient or "")
+    return _POSSESSIVE_RE.sub("", who).lower()
+
+
+def _for_aged(who: str, age: Any) -> str:
+    # "for 29 year old sister", "for friend in their 30s"
+    age = _clean(age).lower()
+    if age.isdigit():
+        return f"for {age} year old {who or 'person'}"
+    if who and re.fullmatch(r"\d0s", age):
+        return f"for {who} in their {age}"
+    return f"for {who}" if who else ""
+
+
+def rule_based_queries(profile: GiftProfile) -> List[str]:
+    """Six search queries for the profile: 2 broad, 2 Pinterest, 2 Etsy (duplicates dropped)."""
+    who = _who(profile)
+    occasion = _clean(profile.occasion or "").lower()
+    interests = _items(profile.interests or "", 2)
+    trait = (_items(profile.personality or "", 1) or [""])[0].lower()
+    budget = f"under {_usd(profile.budget_usd)}" if profile.budget_usd else ""
+    for_who = f"for {who}" if who else ""
+    likes = f"who loves {' and '.join(interests)}" if interests else ""
+    first = interests[0] if interests else ""
+
+    queries = [
+        f"best {occasion} gifts {for_who} {likes} {budget}",
+        f"unique {trait} gift ideas {_for_aged(who, str(profile.age or ''))} {first} {budget}",
+        f"site:pinterest.com {occasion} gift ideas {for_who} {first}",
+        f"site:pinterest.com {trait} aesthetic gifts {interests[-1] if interests else who}",
+        f"site:etsy.com personalized {first} gift {for_who} {budget}",
+        f"site:etsy.com handmade {occasion} gift {interests[-1] if interests else who}",
+    ]
+    out: List[str] = []
+    for q in queries:
+        q = " ".join(q.split())
+        if q not in out:
+            out.append(q)
+    return out
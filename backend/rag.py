@@ -1,9 +1,11 @@
 from dataclasses import dataclass
-from typing import List, Tuple
-import numpy as np
-from .llm import embed_texts
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+from .llm import embed_vectors, aembed_vectors
 from .models import SearchResult
 
+if TYPE_CHECKING:
+    import numpy as np
+
 
 @dataclass
 class RagDoc:
@@ -20,19 +22,74 @@ def build_docs(results: List[SearchResult]) -> List[RagDoc]:
     return docs
 
 
-def top_k_by_similarity(query_text: str, docs: List[RagDoc], k: int = 12) -> List[RagDoc]:
+class EmbeddingContext:
+    """
+    Per-request embedding collector. Callers register every text they will need
+    with add(); the first lookup embeds all pending texts in one batched call and
+    later lookups reuse the normalized vectors.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, None] = {}
+        self._vectors: Dict[str, "np.ndarray"] = {}
+
+    def add(self, texts: Iterable[str]) -> None:
+        for t in texts:
+            if t not in self._vectors:
+                self._pending[t] = None
+
+    def fetch(self) -> None:
+        if not self._pending:
+            return
+        texts = list(self._pending)
+        self._pending.clear()
+        self._store(texts, embed_vectors(texts))
+
+    async def afetch(self) -> None:
+        """Async fetch; once it returns, matrix()/vector() for added texts never block."""
+        if not self._pending:
+            return
+        texts = list(self._pending)
+        self._pending.clear()
+        self._store(texts, await aembed_vectors(texts))
+
+    def _store(self, texts: List[str], vectors: List["np.ndarray"]) -> None:
+        import numpy as np
+
+        M = np.array(vectors, dtype=np.float32)
+        M = M / (np.linalg.norm(M, axis=1, keepdims=True) + 1e-9)
+        for t, v in zip(texts, M):
+            self._vectors[t] = v
+
+    def matrix(self, texts: List[str]) -> "np.ndarray":
+        """Normalized (len(texts), dim) matrix, embedding anything not seen yet."""
+        import numpy as np
+
+        self.add(texts)
+        self.fetch()
+        return np.stack([self._vectors[t] for t in texts])
+
+    def vector(self, text: str) -> "np.ndarray":
+        return self.matrix([text])[0]
+
+
+def top_k_by_similarity(
+    query_text: str,
+    docs: List[RagDoc],
+    k: int = 12,
+    ctx: Optional[EmbeddingContext] = None,
+) -> List[RagDoc]:
     if not docs:
         return []
 
-    q_emb = embed_texts([query_text])[0]
-    d_embs = embed_texts([d.text for d in docs])
+    from .vector_index import top_k_indices
 
-    q = np.array(q_emb, dtype=np.float32)
-    D = np.array(d_embs, dtype=np.float32)
+    ctx = ctx or EmbeddingContext()
+    ctx.add([query_text] + [d.text for d in docs])
 
-    q = q / (np.linalg.norm(q) + 1e-9)
-    D = D / (np.linalg.norm(D, axis=1, keepdims=True) + 1e-9)
+    q = ctx.vector(query_text)
+    D = ctx.matrix([d.text for d in docs])
 
     sims = D @ q
-    idx = np.argsort(-sims)[:k]
+    idx = top_k_indices(sims, k)
     return [docs[i] for i in idx]
@@ -0,0 +1,123 @@
+# backend/ranking.py
+#
+# Batched idea scoring. Per-URL features (domain weight, snippet rating) are computed once per
+# distinct URL into arrays; each idea points at up to RANK_EVIDENCE_PER_IDEA of them through an
+# index matrix, so scoring n ideas is one matrix-vector product plus a few array reductions.
+
+import re
+from typing import TYPE_CHECKING, Dict, List, Sequence
+
+from .config import RANK_FIT_WEIGHT, RANK_DOMAIN_WEIGHT, RANK_RATING_WEIGHT, RANK_DOMAIN_NORM, RANK_EVIDENCE_PER_IDEA
+from .config import MMR_LAMBDA
+from .domains import domain_weight
+from .models import GiftIdea, SearchResult
+
+if TYPE_CHECKING:
+    import numpy as np
+
+_RATING_RE = re.compile(r"(\d\.\d)\s*(?:out of\s*5|stars?)")
+
+
+def rating_signal(text: str) -> float:
+    """
+    Lightweight extraction from snippets only.
+    If no rating text is present, returns 0.
+    """
+    m = _RATING_RE.search((text or "").lower())
+    if m:
+        try:
+            return float(m.group(1)) / 5.0
+        except Exception:
+            return 0.0
+    return 0.0
+
+
+class UrlFeatures:
+    """Domain and rating features for every distinct URL, as arrays indexed by position."""
+
+    def __init__(self, backing_results: Sequence[SearchResult], extra_urls: Sequence[str] = ()):
+        import numpy as np
+
+        texts: Dict[str, str] = {}
+        for r in backing_results:
+            texts.setdefault(r.url, f"{r.title}\n{r.snippet}")
+        for u in extra_urls:
+            texts.setdefault(u, "")
+
+        self.position: Dict[str, int] = {u: i for i, u in enumerate(texts)}
+        self.domain = np.array([domain_weight(u) for u in texts], dtype=np.float32)
+        self.rating = np.array([rating_signal(t) for t in texts.values()], dtype=np.float32)
+
+    def evidence_matrix(self, ideas: Sequence[GiftIdea], per_idea: int = RANK_EVIDENCE_PER_IDEA) -> "np.ndarray":
+        """(n_ideas, per_idea) URL positions, -1 where an idea has fewer evidence URLs."""
+        import numpy as np
+
+        E = np.full((len(ideas), per_idea), -1, dtype=np.int64)
+        for i, g in enumerate(ideas):
+            for j, u in enumerate((g.evidence_urls or [])[:per_idea]):
+                E[i, j] = self.position.get(u, -1)
+        return E
+
+
+def _max_feature(values: "np.ndarray", E: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+
+    if E.shape[1] == 0 or len(values) == 0:
+        return np.zeros(E.shape[0], dtype=np.float32)
+    return np.where(E >= 0, values[np.maximum(E, 0)], 0.0).max(axis=1)
+
+
+def score_matrix(
+    profile_vec: "np.ndarray",
+    idea_vecs: "np.ndarray",
+    features: UrlFeatures,
+    E: "np.ndarray",
+) -> "np.ndarray":
+    """Scores for every idea at once: weighted fit, best evidence domain and best evidence rating."""
+    import numpy as np
+
+    # Vectors come back normalized, so cosine is a plain dot product, mapped from [-1, 1] to [0, 1]
+    fit = (idea_vecs @ profile_vec + 1.0) / 2.0
+    domain = np.minimum(_max_feature(features.domain, E) / RANK_DOMAIN_NORM, 1.0)
+    rating = _max_feature(features.rating, E)
+    return RANK_FIT_WEIGHT * fit + RANK_DOMAIN_WEIGHT * domain + RANK_RATING_WEIGHT * rating
+
+
+def rank(
+    profile_vec: "np.ndarray",
+    idea_vecs: "np.ndarray",
+    ideas: List[GiftIdea],
+    backing_results: Sequence[SearchResult],
+) -> List[GiftIdea]:
+    """Sets .score on every idea and returns them best first (ties keep their original order)."""
+    import numpy as np
+
+    if not ideas:
+        return []
+    features = UrlFeatures(backing_results, [u for g in ideas for u in (g.evidence_urls or [])])
+    scores = score_matrix(profile_vec, idea_vecs, features, features.evidence_matrix(ideas))
+    for g, s in zip(ideas, scores):
+        g.score = float(s)
+    return [ideas[i] for i in np.argsort(-scores, kind="stable")]
+
+
+def mmr_order(scores: "np.ndarray", vecs: "np.ndarray", lam: float = MMR_LAMBDA) -> List[int]:
+    """
+    Maximal marginal relevance: repeatedly picks the candidate maximizing
+    lam * score - (1 - lam) * (highest similarity to anything already picked),
+    so near-duplicates sink below different ideas of similar quality.
+    """
+    import numpy as np
+
+    n = len(scores)
+    scores = np.asarray(scores, dtype=np.float32)
+    closest = np.zeros(n, dtype=np.float32)
+    taken = np.zeros(n, dtype=bool)
+    order: List[int] = []
+    for _ in range(n):
+        value = np.where(taken, -np.inf, lam * scores - (1.0 - lam) * closest)
+        i = int(np.argmax(value))
+        order.append(i)
+        taken[i] = True
+        closest = np.maximum(closest, vecs @ vecs[i])
+    return order
@@ -1,51 +1,29 @@
-from typing import List, Set
-from urllib.parse import urlparse
-import re
-import numpy as np
+import asyncio
+import contextvars
+import json
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Dict, Iterator, List, Optional, Set, Tuple
 
-from .models import GiftProfile, SearchResult, GiftIdea, GiftBatch
+from .models import GiftProfile, SearchResult, GiftIdea, GiftBatch, BatchEvent
 from .prompts import SYSTEM_GIFT_BOT, QUERY_PLANNER, IDEA_EXTRACTOR, BUY_LINK_FINDER, CARD_WRITER
-from .search_providers import search_web
-from .rag import build_docs, top_k_by_similarity
-from .llm import llm_json, llm_text, embed_texts
-from .config import PINTEREST_WEIGHT, ETSY_WEIGHT, DEFAULT_WEIGHT, RETAIL_WEIGHT, BUY_LINKS_PER_IDEA
-
-
-RETAIL_DOMAINS = {
-    "amazon.com", "target.com", "walmart.com", "bestbuy.com", "nike.com", "adidas.com",
-    "crateandbarrel.com", "potterybarn.com", "sephora.com", "ulta.com", "barnesandnoble.com",
-    "etsy.com"
-}
-
-
-def _domain_weight(url: str) -> float:
-    try:
-        host = (urlparse(url).hostname or "").lower()
-    except Exception:
-        return DEFAULT_WEIGHT
-
-    if "pinterest." in host:
-        return PINTEREST_WEIGHT
-    if host.endswith("etsy.com"):
-        return ETSY_WEIGHT
-    if any(host.endswith(d) for d in RETAIL_DOMAINS):
-        return RETAIL_WEIGHT
-    return DEFAULT_WEIGHT
-
-
-def _rating_signal(text: str) -> float:
-    """
-    Lightweight extraction from snippets only.
-    If no rating text is present, returns 0.
-    """
-    t = (text or "").lower()
-    m = re.search(r"(\d\.\d)\s*(?:out of\s*5|stars?)", t)
-    if m:
-        try:
-            return float(m.group(1)) / 5.0
-        except Exception:
-            return 0.0
-    return 0.0
+from .search_providers import asearch_many
+from .concurrency import gather_bounded, iter_sync, run_sync
+from .tracing import count, span
+from .rag import EmbeddingContext, build_docs, top_k_by_similarity
+from .domains import domain_weight
+from .query_planner import rule_based_queries
+from .ranking import mmr_order, rank
+from .llm import allm_json, allm_text, allm_text_stream
+from .result_cache import result_cache, result_key
+from .buy_link_cache import buy_link_cache, link_key
+from .semantic_cache import evidence_cache
+from .providers import embed_provider, selected_name
+from .config import BUY_LINKS_PER_IDEA, CANDIDATE_POOL_FACTOR, QUERY_PLANNER_MODE
+from .config import BUY_LINK_MAX_IN_FLIGHT, BUY_LINK_DEADLINE_S, BUY_LINK_QUERIES_TIMEOUT_S
+from .config import EVIDENCE_MIN_DOCS, EVIDENCE_TOP_K
+from .evidence_store import evidence_store
+
+if TYPE_CHECKING:
+    import numpy as np
 
 
 def _profile_text(p: GiftProfile) -> str:
@@ -63,21 +41,47 @@ def _profile_text(p: GiftProfile) -> str:
     return "\n".join([x for x in parts if x]).strip()
 
 
-def plan_queries(profile: GiftProfile) -> List[str]:
+def _plan_queries_prompt(profile: GiftProfile) -> str:
     user = f"PROFILE:\n{_profile_text(profile)}\n\nReturn JSON with key 'queries' as an array."
-    raw = llm_json(SYSTEM_GIFT_BOT, f"{QUERY_PLANNER}\n\n{user}")
+    return f"{QUERY_PLANNER}\n\n{user}"
+
+
+def _parse_queries(raw: str) -> List[str]:
     # Minimal parsing to avoid brittle strict schemas
-    import json
-    obj = json.loads(raw)
-    queries = obj.get("queries") or []
+    try:
+        obj = json.loads(raw)
+    except (TypeError, ValueError):
+        return []
+    queries = obj.get("queries") if isinstance(obj, dict) else None
+    if not isinstance(queries, list):
+        return []
     return [q for q in queries if isinstance(q, str) and q.strip()][:6]
 
 
-def gather_results(queries: List[str]) -> List[SearchResult]:
+async def aplan_queries(profile: GiftProfile, mode: Optional[str] = None) -> List[str]:
+    """Search queries for the profile, from templates or the LLM (QUERY_PLANNER_MODE unless given)."""
+    mode = mode or QUERY_PLANNER_MODE
+    with span("stage.plan_queries", mode=mode) as attrs:
+        queries: List[str] = []
+        if mode == "llm":
+            raw = await allm_json(SYSTEM_GIFT_BOT, _plan_queries_prompt(profile), cache_site="plan_queries")
+            queries = _parse_queries(raw)
+        if not queries:
+            queries = rule_based_queries(profile)
+        attrs["queries"] = len(queries)
+    return queries
+
+
+def plan_queries(profile: GiftProfile, mode: Optional[str] = None) -> List[str]:
+    return run_sync(aplan_queries(profile, mode))
+
+
+def _dedup_results(result_lists: List[List[SearchResult]]) -> List[SearchResult]:
     seen = set()
     all_results: List[SearchResult] = []
-    for q in queries:
-        for r in search_web(q):
+    # Searches run concurrently; walking them in query order keeps first-seen dedup stable
+    for results in result_lists:
+        for r in results:
             if r.url in seen:
                 continue
             seen.add(r.url)
@@ -85,9 +89,18 @@ def gather_results(queries: List[str]) -> List[SearchResult]:
     return all_results
 
 
-def extract_ideas(profile: GiftProfile, results: List[SearchResult], k: int, exclude_names: Set[str]) -> List[GiftIdea]:
-    import json
+async def agather_results(queries: List[str]) -> List[SearchResult]:
+    with span("stage.gather_results", queries=len(queries)) as attrs:
+        results = _dedup_results(await asearch_many(queries))
+        attrs["results"] = len(results)
+    return results
+
+
+def gather_results(queries: List[str]) -> List[SearchResult]:
+    return run_sync(agather_results(queries))
 
+
+def _extract_ideas_prompt(profile: GiftProfile, results: List[SearchResult], k: int, exclude_names: Set[str]) -> str:
     profile_txt = _profile_text(profile)
     condensed = []
     for r in results[:40]:
@@ -109,8 +122,10 @@ WEB SNIPPETS:
 Return JSON with key 'ideas' as array of objects:
 name (string), why_it_fits (string), estimated_price (string|null), evidence_urls (array of strings).
 """
+    return IDEA_EXTRACTOR.format(k=k) + "\n\n" + user
+
 
-    raw = llm_json(SYSTEM_GIFT_BOT, IDEA_EXTRACTOR.format(k=k) + "\n\n" + user)
+def _parse_ideas(raw: str, k: int, exclude_names: Set[str]) -> List[GiftIdea]:
     obj = json.loads(raw)
 
     ideas = []
@@ -137,110 +152,567 @@ name (string), why_it_fits (string), estimated_price (string|null), evidence_url
     return ideas[:k]
 
 
-def _fit_scores(profile: GiftProfile, ideas: List[GiftIdea]) -> List[float]:
-    if not ideas:
-        return []
+async def aextract_ideas(
+    profile: GiftProfile, results: List[SearchResult], k: int, exclude_names: Set[str]
+) -> List[GiftIdea]:
+    with span("stage.extract_ideas", k=k) as attrs:
+        raw = await allm_json(
+            SYSTEM_GIFT_BOT, _extract_ideas_prompt(profile, results, k, exclude_names), cache_site="extract_ideas"
+        )
+        ideas = _parse_ideas(raw, k, exclude_names)
+        attrs["ideas"] = len(ideas)
+    return ideas
 
-    profile_txt = _profile_text(profile)
-    texts = [profile_txt] + [f"{g.name}\n{g.why_it_fits}" for g in ideas]
-    embs = embed_texts(texts)
 
-    p = np.array(embs[0], dtype=np.float32)
-    p = p / (np.linalg.norm(p) + 1e-9)
+def extract_ideas(profile: GiftProfile, results: List[SearchResult], k: int, exclude_names: Set[str]) -> List[GiftIdea]:
+    return run_sync(aextract_ideas(profile, results, k, exclude_names))
+
 
-    out = []
-    for e in embs[1:]:
-        v = np.array(e, dtype=np.float32)
-        v = v / (np.linalg.norm(v) + 1e-9)
-        out.append(float(v @ p))
-    return out
+def _idea_text(g: GiftIdea) -> str:
+    return f"{g.name}\n{g.why_it_fits}"
 
 
-def find_buy_link(idea: GiftIdea) -> str | None:
-    import json
+def _fallback_link(idea: GiftIdea) -> str | None:
+    return idea.evidence_urls[0] if idea.evidence_urls else None
+
+
+def _template_queries(idea: GiftIdea) -> List[str]:
+    return [f"{idea.name} buy", f"site:etsy.com {idea.name}"]
+
+
+def _has_etsy_evidence(idea: GiftIdea) -> bool:
+    return any("etsy.com" in u for u in idea.evidence_urls or [])
+
+
+def _buy_link_queries_prompt(ideas: List[GiftIdea]) -> str:
+    lines = [f"- {g.name}{' [etsy]' if _has_etsy_evidence(g) else ''}" for g in ideas]
+    return f"{BUY_LINK_FINDER}\n\nIDEAS:\n" + "\n".join(lines)
+
+
+def _parse_buy_link_queries(raw: str, ideas: List[GiftIdea]) -> Dict[str, List[str]]:
+    # Anything missing or malformed falls back per idea, so one bad entry doesn't cost the others
+    try:
+        obj = json.loads(raw)
+    except (TypeError, ValueError):
+        obj = None
+    if not isinstance(obj, dict):
+        obj = {}
+    out: Dict[str, List[str]] = {}
+    for g in ideas:
+        queries = obj.get(g.name)
+        queries = [q for q in queries if isinstance(q, str) and q.strip()][:5] if isinstance(queries, list) else []
+        if not queries:
+            count("buy_link_query_fallbacks")
+            queries = _template_queries(g)
+        out[g.name] = queries
+    return out
 
-    evidence_urls = idea.evidence_urls or []
-    evidence_hint = ""
-    if any("etsy.com" in u for u in evidence_urls):
-        evidence_hint = "If an Etsy listing URL is present in evidence, prefer that as a buy link."
 
-    raw = llm_json(
-        SYSTEM_GIFT_BOT,
-        f"{BUY_LINK_FINDER}\n\nIDEA: {idea.name}\n{evidence_hint}\nReturn JSON array of strings.",
-    )
-    queries = json.loads(raw)
-    queries = [q for q in queries if isinstance(q, str) and q.strip()]
+async def aplan_buy_link_queries(
+    ideas: List[GiftIdea], timeout: float = BUY_LINK_QUERIES_TIMEOUT_S
+) -> Dict[str, List[str]]:
+    """
+    Search queries for every idea from one LLM call, as {idea name: queries}.
+    Ideas the response doesn't cover (or a response that is not a JSON object, or one that
+    takes longer than `timeout`) get the "<name> buy" / "site:etsy.com <name>" template.
+    """
+    if not ideas:
+        return {}
+    with span("stage.buy_link_queries", ideas=len(ideas)) as attrs:
+        try:
+            raw = await asyncio.wait_for(
+                allm_json(SYSTEM_GIFT_BOT, _buy_link_queries_prompt(ideas), cache_site="buy_link_queries"),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            count("buy_link_timeouts")
+            raw = ""
+        queries = _parse_buy_link_queries(raw, ideas)
+        attrs["queries"] = sum(len(q) for q in queries.values())
+    return queries
+
 
+async def _asearch_buy_link(queries: List[str]) -> Tuple[str, float] | None:
+    """(url, domain weight) of the best-weighted hit for the queries, or None."""
     best = None
     best_w = 0.0
 
-    for q in queries[:5]:
-        results = search_web(q)
+    for results in await asearch_many(queries[:5]):
         for r in results[:BUY_LINKS_PER_IDEA]:
-            w = _domain_weight(r.url)
+            w = domain_weight(r.url)
             if w > best_w:
                 best_w = w
                 best = r.url
 
-    if best:
-        return best
+    return (best, best_w) if best else None
 
-    if evidence_urls:
-        return evidence_urls[0]
-    return None
 
+async def afind_buy_link(idea: GiftIdea, queries: Optional[List[str]] = None) -> str | None:
+    """Best-weighted search hit for the idea; queries come from aplan_buy_link_queries when not given."""
+    if queries is None:
+        queries = (await aplan_buy_link_queries([idea]))[idea.name]
 
-def rank_and_fill(profile: GiftProfile, ideas: List[GiftIdea], backing_results: List[SearchResult]) -> List[GiftIdea]:
-    fit = _fit_scores(profile, ideas)
+    found = await _asearch_buy_link(queries)
+    if found:
+        return found[0]
+    return _fallback_link(idea)
 
-    # Build quick evidence text for ratings/domain scoring
-    url_to_text = {}
-    for r in backing_results:
-        url_to_text[r.url] = f"{r.title}\n{r.snippet}"
 
-    for i, g in enumerate(ideas):
-        domain_boost = 0.0
-        rating_boost = 0.0
+def find_buy_link(idea: GiftIdea) -> str | None:
+    return run_sync(afind_buy_link(idea))
+
+
+# Stale cached links being looked up again; only touched from the event loop thread
+_refreshing: Set[str] = set()
+_refresh_tasks: Set["asyncio.Task"] = set()
+
+
+def _refresh_buy_links_in_background(stale: List[Tuple[str, GiftIdea]]) -> None:
+    """Re-runs query planning and search for stale cached links without holding up the request."""
+    stale = [(key, g) for key, g in stale if key not in _refreshing]
+    if not stale:
+        return
+    _refreshing.update(key for key, _ in stale)
+
+    async def _run() -> None:
+        try:
+            queries = await aplan_buy_link_queries([g for _, g in stale])
+            found = await asyncio.gather(
+                *(_asearch_buy_link(queries[g.name]) for _, g in stale), return_exceptions=True
+            )
+            for (key, _), f in zip(stale, found):
+                if isinstance(f, tuple):
+                    buy_link_cache.put(key, *f)
+        except Exception:
+            pass
+        finally:
+            _refreshing.difference_update(key for key, _ in stale)
 
-        for u in (g.evidence_urls or [])[:4]:
-            domain_boost = max(domain_boost, _domain_weight(u))
-            rating_boost = max(rating_boost, _rating_signal(url_to_text.get(u, "")))
+    # Empty context, so the refresh doesn't record spans into the request's trace
+    task = contextvars.Context().run(asyncio.get_running_loop().create_task, _run())
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
 
-        fit_score = (fit[i] + 1.0) / 2.0  # normalize cosine from [-1,1] to [0,1]
-        domain_score = min(domain_boost / 1.35, 1.0) if domain_boost else 0.0
 
-        g.score = 0.55 * fit_score + 0.25 * domain_score + 0.20 * rating_boost
+async def aresolve_buy_links(
+    ideas: List[GiftIdea],
+    on_resolved: Callable[[GiftIdea], None] | None = None,
+    budget_usd: Optional[float] = None,
+) -> List[GiftIdea]:
+    """
+    Resolves buy links for all ideas concurrently.
+    Links cached for the idea name (and budget band) are used at once, and refreshed in the
+    background when stale. Search queries for the rest come from one batched LLM call (at most
+    BUY_LINK_QUERIES_TIMEOUT_S); planning and searching together get BUY_LINK_DEADLINE_S, and an
+    idea still unresolved then falls back to its first evidence URL.
+    on_resolved(idea) is called as each idea's link is set.
+    """
+    def _done(g: GiftIdea, link: str | None) -> str | None:
+        g.buy_link = link
+        if on_resolved is not None:
+            on_resolved(g)
+        return link
+
+    keys = {id(g): link_key(g.name, budget_usd) for g in ideas}
+    queries: Dict[str, List[str]] = {}
+
+    async def _find(g: GiftIdea) -> str | None:
+        found = await _asearch_buy_link(queries.get(g.name) or _template_queries(g))
+        if found is None:
+            return _done(g, _fallback_link(g))
+        buy_link_cache.put(keys[id(g)], *found)
+        return _done(g, found[0])
+
+    def _timed_out(g: GiftIdea) -> str | None:
+        count("buy_link_timeouts")
+        return _done(g, _fallback_link(g))
+
+    with span("stage.buy_links", ideas=len(ideas)) as attrs:
+        misses: List[GiftIdea] = []
+        stale: List[Tuple[str, GiftIdea]] = []
+        for g in ideas:
+            hit = buy_link_cache.get(keys[id(g)])
+            if hit is None:
+                misses.append(g)
+                continue
+            link, is_stale = hit
+            _done(g, link.url)
+            if is_stale:
+                stale.append((keys[id(g)], g.model_copy()))
+        attrs["cache_hits"] = len(ideas) - len(misses)
+        count("buy_link_cache_hits", len(ideas) - len(misses))
+        count("buy_link_cache_misses", len(misses))
+
+        if misses:
+            # Planning and searching share one deadline, so the stage never runs past BUY_LINK_DEADLINE_S
+            deadline = asyncio.get_running_loop().time() + BUY_LINK_DEADLINE_S
+            queries.update(await aplan_buy_link_queries(misses, min(BUY_LINK_QUERIES_TIMEOUT_S, BUY_LINK_DEADLINE_S)))
+            await gather_bounded(
+                _find,
+                misses,
+                max_in_flight=BUY_LINK_MAX_IN_FLIGHT,
+                timeout=None,
+                on_timeout=_timed_out,
+                deadline=deadline,
+            )
+    if stale:
+        _refresh_buy_links_in_background(stale)
+    return ideas
 
-    ideas.sort(key=lambda x: x.score, reverse=True)
+
+def resolve_buy_links(ideas: List[GiftIdea], budget_usd: Optional[float] = None) -> List[GiftIdea]:
+    return run_sync(aresolve_buy_links(ideas, budget_usd=budget_usd))
+
+
+def _score_ideas(
+    profile: GiftProfile,
+    ideas: List[GiftIdea],
+    backing_results: List[SearchResult],
+    ctx: EmbeddingContext,
+) -> List[GiftIdea]:
+    if not ideas:
+        return ideas
+    p = ctx.vector(_profile_text(profile))
+    V = ctx.matrix([_idea_text(g) for g in ideas])
+    ideas[:] = rank(p, V, ideas, backing_results)
     return ideas
 
 
-def generate_batch(profile: GiftProfile, exclude_names: Set[str], k: int = 5) -> GiftBatch:
-    queries = plan_queries(profile)
-    results = gather_results(queries)
+async def arank_and_fill(
+    profile: GiftProfile,
+    ideas: List[GiftIdea],
+    backing_results: List[SearchResult],
+    ctx: EmbeddingContext | None = None,
+) -> List[GiftIdea]:
+    with span("stage.rank", ideas=len(ideas)):
+        ctx = ctx or EmbeddingContext()
+        ctx.add([_profile_text(profile)] + [_idea_text(g) for g in ideas])
+        await ctx.afetch()
+        return _score_ideas(profile, ideas, backing_results, ctx)
+
+
+def rank_and_fill(
+    profile: GiftProfile,
+    ideas: List[GiftIdea],
+    backing_results: List[SearchResult],
+    ctx: EmbeddingContext | None = None,
+) -> List[GiftIdea]:
+    return run_sync(arank_and_fill(profile, ideas, backing_results, ctx))
+
+
+async def _alive_evidence(profile: GiftProfile) -> Tuple[List[str], List[SearchResult]]:
+    queries = await aplan_queries(profile)
+    return queries, await agather_results(queries)
+
+
+async def _astored_evidence(
+    profile: GiftProfile, profile_txt: str, ctx: EmbeddingContext, space: Tuple[str, str]
+) -> Tuple["np.ndarray", Optional[Tuple[List[str], List[SearchResult]]]]:
+    """Profile vector, plus (queries, results) from a near-duplicate profile or the corpus when either has enough."""
+    with span("stage.evidence_cache") as attrs:
+        ctx.add([profile_txt])
+        await ctx.afetch()
+        vector = ctx.vector(profile_txt)
+        hit = evidence_cache.lookup(space, vector, profile.budget_usd)
+        attrs["hit"] = hit is not None
+        if hit is not None:
+            attrs["similarity"] = round(hit[1], 4)
+
+    if hit is not None:
+        count("evidence_cache_hits")
+        return vector, (hit[0].queries, hit[0].results)
+    count("evidence_cache_misses")
+
+    with span("stage.evidence_store") as attrs:
+        stored = await asyncio.to_thread(
+            evidence_store.search, space[0], vector, EVIDENCE_TOP_K,
+            local_source=space[1] == "local", budget_usd=profile.budget_usd,
+        )
+        attrs["docs"] = len(stored)
+
+    if len(stored) >= EVIDENCE_MIN_DOCS:
+        count("evidence_store_hits")
+        results = [r for r, _ in stored]
+        evidence_cache.add(space, vector, profile.budget_usd, [], results)
+        return vector, ([], results)
+    count("evidence_store_misses")
+    return vector, None
+
+
+async def _aevidence(
+    profile: GiftProfile, profile_txt: str, ctx: EmbeddingContext
+) -> Tuple[List[str], List[SearchResult], bool]:
+    """
+    Planned queries and search results for a profile, as (queries, results, came from live search).
+    Query planning and live search start at once; meanwhile the profile is embedded and looked up
+    in the recently served near-duplicate profiles, then in the local evidence corpus. When either
+    has enough evidence the live search is cancelled and its results are not waited for.
+    """
+    space = (embed_provider().model, selected_name("search"))
+    live = asyncio.ensure_future(_alive_evidence(profile))
+    try:
+        vector, reused = await _astored_evidence(profile, profile_txt, ctx, space)
+        if reused is not None:
+            live.cancel()
+            queries, results = reused
+        else:
+            # Thin coverage: using the live search (its results are added to the corpus after embedding)
+            queries, results = await live
+    finally:
+        if not live.done():
+            live.cancel()
+
+    if reused is None:
+        evidence_cache.add(space, vector, profile.budget_usd, queries, results)
+    return queries, results, reused is None
+
+
+def _diversify(ideas: List[GiftIdea], ctx: EmbeddingContext) -> List[GiftIdea]:
+    """Ranked ideas reordered by MMR over their embeddings (already fetched by ranking)."""
+    if len(ideas) < 2:
+        return ideas
+    V = ctx.matrix([_idea_text(g) for g in ideas])
+    return [ideas[i] for i in mmr_order([g.score for g in ideas], V)]
+
+
+async def _aranked_ideas(
+    profile: GiftProfile, exclude_names: Set[str], k: int
+) -> Tuple[List[GiftIdea], List[GiftIdea], List[str]]:
+    """
+    Runs everything up to ranking; returns (top k ideas without buy links, the remaining
+    candidates in the same order, queries used). One extraction call over-generates
+    CANDIDATE_POOL_FACTOR x k candidates, so exclusions and weak ideas rarely leave a batch short.
+    """
+    # One embedding context per request: the profile vector is fetched first (to look for
+    # reusable evidence), then the documents, and both are reused for ranking
+    ctx = EmbeddingContext()
+    profile_txt = _profile_text(profile)
+    queries, results, live = await _aevidence(profile, profile_txt, ctx)
 
     # RAG selection: pick top documents most relevant to profile
-    docs = build_docs(results)
-    top_docs = top_k_by_similarity(_profile_text(profile), docs, k=18)
+    with span("stage.rag", docs=len(results)):
+        docs = build_docs(results)
+        ctx.add([profile_txt] + [d.text for d in docs])
+        await ctx.afetch()
+        top_docs = top_k_by_similarity(profile_txt, docs, k=18, ctx=ctx)
+
+    if live and docs:
+        # Growing the evidence corpus with vectors the RAG step already fetched
+        await asyncio.to_thread(
+            evidence_store.add,
+            embed_provider().model,
+            results,
+            ctx.matrix([d.text for d in docs]),
+            [domain_weight(r.url) for r in results],
+            profile.budget_usd,
+            ctx.vector(profile_txt),
+        )
 
     # Rebuild a reduced result list from top docs only
     top_urls = {d.url for d in top_docs}
     reduced = [r for r in results if r.url in top_urls]
 
-    ideas = extract_ideas(profile, reduced, k=k, exclude_names=exclude_names)
-    ideas = rank_and_fill(profile, ideas, reduced)
+    ideas = await aextract_ideas(profile, reduced, k=k * CANDIDATE_POOL_FACTOR, exclude_names=exclude_names)
+    ideas = _diversify(await arank_and_fill(profile, ideas, reduced, ctx=ctx), ctx)
+    return ideas[:k], ideas[k:], queries
 
-    # Fill buy links
-    for g in ideas[:k]:
-        g.buy_link = find_buy_link(g)
 
-    # Keep final top k
-    final = ideas[:k]
-    notes = f"Search queries used:\n" + "\n".join(f"- {q}" for q in queries)
-    return GiftBatch(ideas=final, search_notes=notes)
+def _batch(ideas: List[GiftIdea], queries: List[str], reserve: List[GiftIdea] | None = None) -> GiftBatch:
+    if not queries:
+        notes = "Evidence from previously collected search results (no new searches)."
+    else:
+        notes = f"Search queries used:\n" + "\n".join(f"- {q}" for q in queries)
+    return GiftBatch(ideas=ideas, search_notes=notes, reserve=reserve or [])
 
 
-def generate_cards(profile: GiftProfile, selected_ideas: List[GiftIdea]) -> str:
+def _take_reserve(batch: GiftBatch, exclude_names: Set[str], k: int) -> GiftBatch | None:
+    """The next k unused candidates of a batch (copies, without buy links); None once used up."""
+    excluded = {x.lower() for x in exclude_names} | {g.name.lower() for g in batch.ideas}
+    pool = [g.model_copy() for g in batch.reserve if g.name.lower() not in excluded]
+    if not pool:
+        return None
+    count("reserve_served", len(pool[:k]))
+    return GiftBatch(ideas=pool[:k], search_notes=batch.search_notes, reserve=pool[k:])
+
+
+def next_from_reserve(
+    batch: GiftBatch, exclude_names: Set[str], k: int = 5, budget_usd: Optional[float] = None
+) -> GiftBatch | None:
+    """
+    The next k unused candidates of a batch, with no LLM or search calls.
+    Buy links come from the buy-link cache, else each idea's first evidence URL.
+    None once the reserve is used up. astream_again also resolves links and writes cards.
+    """
+    nxt = _take_reserve(batch, exclude_names, k)
+    if nxt is None:
+        return None
+    for g in nxt.ideas:
+        hit = buy_link_cache.get(link_key(g.name, budget_usd))
+        g.buy_link = g.buy_link or (hit[0].url if hit is not None else _fallback_link(g))
+    return nxt
+
+
+def _cached_result(
+    profile: GiftProfile, exclude_names: Set[str], k: int, with_cards: bool
+) -> Tuple[str, Optional[Tuple[GiftBatch, Optional[str]]]]:
+    """Looks up a finished batch for this profile + exclude list; returns (key, hit or None)."""
+    key = result_key(profile, exclude_names, k)
+    hit = result_cache.get(key, with_cards=with_cards)
+    count("result_cache_hits" if hit is not None else "result_cache_misses")
+    return key, hit
+
+
+async def agenerate_batch(profile: GiftProfile, exclude_names: Set[str], k: int = 5) -> GiftBatch:
+    key, hit = _cached_result(profile, exclude_names, k, with_cards=False)
+    if hit is not None:
+        return hit[0]
+
+    final, reserve, queries = await _aranked_ideas(profile, exclude_names, k)
+
+    # Fill buy links (all ideas in parallel)
+    await aresolve_buy_links(final, budget_usd=profile.budget_usd)
+    batch = _batch(final, queries, reserve)
+    result_cache.put(key, batch)
+    return batch
+
+
+async def agenerate_batch_with_cards(
+    profile: GiftProfile, exclude_names: Set[str], k: int = 5
+) -> Tuple[GiftBatch, str]:
+    """
+    generate_batch + generate_cards in one go. The card writer only needs idea names,
+    so it starts as soon as ranking is done and runs alongside buy-link lookup.
+    """
+    key, hit = _cached_result(profile, exclude_names, k, with_cards=True)
+    if hit is not None:
+        return hit
+
+    final, reserve, queries = await _aranked_ideas(profile, exclude_names, k)
+    _, cards = await asyncio.gather(aresolve_buy_links(final, budget_usd=profile.budget_usd), agenerate_cards(profile, final))
+    batch = _batch(final, queries, reserve)
+    result_cache.put(key, batch, cards)
+    return batch, cards
+
+
+def generate_batch(profile: GiftProfile, exclude_names: Set[str], k: int = 5) -> GiftBatch:
+    return run_sync(agenerate_batch(profile, exclude_names, k))
+
+
+def generate_batch_with_cards(profile: GiftProfile, exclude_names: Set[str], k: int = 5) -> Tuple[GiftBatch, str]:
+    return run_sync(agenerate_batch_with_cards(profile, exclude_names, k))
+
+
+async def astream_batch(profile: GiftProfile, exclude_names: Set[str], k: int = 5) -> AsyncIterator[BatchEvent]:
+    """
+    Streaming form of generate_batch_with_cards. Yields an "idea" event per ranked idea,
+    a "buy_link" event as each link resolves, "cards_delta" events with card text as it
+    is written, and a final "done" event carrying the batch and the full card text.
+    A cached result is replayed as the same sequence of events, all at once.
+    """
+    key, hit = _cached_result(profile, exclude_names, k, with_cards=True)
+    if hit is not None:
+        batch, cards = hit
+        for kind in ("idea", "buy_link"):
+            for i, g in enumerate(batch.ideas):
+                yield BatchEvent(kind=kind, index=i, idea=g)
+        yield BatchEvent(kind="cards_delta", text=cards)
+        yield BatchEvent(kind="done", batch=batch, text=cards)
+        return
+
+    final, reserve, queries = await _aranked_ideas(profile, exclude_names, k)
+    card_parts: List[str] = []
+    async for ev in _astream_links_and_cards(profile, final, card_parts):
+        yield ev
+
+    batch, cards = _batch(final, queries, reserve), "".join(card_parts)
+    result_cache.put(key, batch, cards)
+    yield BatchEvent(kind="done", batch=batch, text=cards)
+
+
+async def _astream_links_and_cards(
+    profile: GiftProfile, ideas: List[GiftIdea], card_parts: List[str]
+) -> AsyncIterator[BatchEvent]:
+    """
+    An "idea" event per idea, then "buy_link" and "cards_delta" events as links resolve and
+    card text is written (collected into card_parts).
+    """
+    positions = {id(g): i for i, g in enumerate(ideas)}
+    for i, g in enumerate(ideas):
+        yield BatchEvent(kind="idea", index=i, idea=g)
+
+    events: "asyncio.Queue[BatchEvent | None]" = asyncio.Queue()
+
+    async def _links() -> None:
+        await aresolve_buy_links(
+            ideas,
+            on_resolved=lambda g: events.put_nowait(BatchEvent(kind="buy_link", index=positions[id(g)], idea=g)),
+            budget_usd=profile.budget_usd,
+        )
+
+    async def _cards() -> None:
+        with span("stage.cards"):
+            async for delta in allm_text_stream(SYSTEM_GIFT_BOT, _cards_prompt(profile, ideas)):
+                card_parts.append(delta)
+                events.put_nowait(BatchEvent(kind="cards_delta", text=delta))
+
+    async def _both() -> None:
+        try:
+            await asyncio.gather(_links(), _cards())
+        finally:
+            events.put_nowait(None)
+
+    worker = asyncio.ensure_future(_both())
+    try:
+        while True:
+            ev = await events.get()
+            if ev is None:
+                break
+            yield ev
+        # Surfacing any stage error after the stream drains
+        await worker
+    finally:
+        worker.cancel()
+
+
+async def astream_again(
+    profile: GiftProfile, batch: GiftBatch, exclude_names: Set[str], k: int = 5
+) -> AsyncIterator[BatchEvent]:
+    """
+    "Generate again": the next k unused candidates of `batch`, streamed like astream_batch (cached
+    buy links at once, the rest looked up, card text written for them) with no ranking or
+    search. Once the reserve is used up, a new batch excluding exclude_names.
+    """
+    nxt = _take_reserve(batch, exclude_names, k)
+    if nxt is None:
+        async for ev in astream_batch(profile, exclude_names, k):
+            yield ev
+        return
+
+    card_parts: List[str] = []
+    async for ev in _astream_links_and_cards(profile, nxt.ideas, card_parts):
+        yield ev
+    yield BatchEvent(kind="done", batch=nxt, text="".join(card_parts))
+
+
+def stream_batch(profile: GiftProfile, exclude_names: Set[str], k: int = 5) -> Iterator[BatchEvent]:
+    """Blocking iterator over astream_batch events, for Streamlit script threads."""
+    return iter_sync(astream_batch(profile, exclude_names, k))
+
+
+def stream_again(profile: GiftProfile, batch: GiftBatch, exclude_names: Set[str], k: int = 5) -> Iterator[BatchEvent]:
+    """Blocking iterator over astream_again events."""
+    return iter_sync(astream_again(profile, batch, exclude_names, k))
+
+
+def _cards_prompt(profile: GiftProfile, selected_ideas: List[GiftIdea]) -> str:
     idea_lines = "\n".join([f"- {g.name}" for g in selected_ideas])
-    user = f"PROFILE:\n{_profile_text(profile)}\n\nSELECTED IDEAS:\n{idea_lines}\n\n{CARD_WRITER}"
-    return llm_text(SYSTEM_GIFT_BOT, user)
+    return f"PROFILE:\n{_profile_text(profile)}\n\nSELECTED IDEAS:\n{idea_lines}\n\n{CARD_WRITER}"
+
+
+async def agenerate_cards(profile: GiftProfile, selected_ideas: List[GiftIdea]) -> str:
+    with span("stage.cards"):
+        return await allm_text(SYSTEM_GIFT_BOT, _cards_prompt(profile, selected_ideas))
+
+
+def generate_cards(profile: GiftProfile, selected_ideas: List[GiftIdea]) -> str:
+    return run_sync(agenerate_cards(profile, selected_ideas))
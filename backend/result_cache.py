@@ -0,0 +1,115 @@
+# backend/result_cache.py
+
+import json
+import re
+import time
+from typing import Any, Iterable, Optional, Tuple
+
+from .cache import SqliteStore, TTLCache, content_key
+from .config import RESULT_CACHE_MAX_ITEMS, RESULT_CACHE_PATH, RESULT_CACHE_TTL_S, RESULT_CACHE_DB_MAX_ROWS
+from .models import GiftBatch, GiftProfile
+from .providers import selected_name
+
+# Free-text fields people fill with comma-separated lists, where order carries no meaning
+_LIST_FIELDS = {"interests", "no_go", "personality"}
+_SPLIT_RE = re.compile(r"\s*[,;]\s*")
+
+
+def _norm_text(value: Any) -> str:
+    return " ".join(str(value).lower().split()).strip(" .!")
+
+
+def _norm_list(values: Iterable[str]) -> list:
+    return sorted({v for v in (_norm_text(x) for x in values) if v})
+
+
+def canonical_profile(profile: Any) -> dict:
+    """
+    GiftProfile fields in a canonical form, so trivially different inputs share a key.
+    Accepts any object with the GiftProfile attributes (the app passes a SimpleNamespace).
+    """
+    out = {}
+    for name in GiftProfile.model_fields:
+        value = getattr(profile, name, None)
+        if value is None or value == "":
+            continue
+        if name == "budget_usd":
+            out[name] = round(float(value), 2)
+        elif name in _LIST_FIELDS:
+            items = _norm_list(_SPLIT_RE.split(str(value)))
+            if items:
+                out[name] = items
+        else:
+            text = _norm_text(value)
+            if text:
+                out[name] = text
+    return out
+
+
+def result_key(profile: Any, exclude_names: Iterable[str], k: int) -> str:
+    # Provider names are part of the key so offline/local runs never serve live results (or vice versa)
+    return content_key(
+        json.dumps(canonical_profile(profile), sort_keys=True),
+        json.dumps(_norm_list(exclude_names)),
+        str(k),
+        selected_name("chat"),
+        selected_name("embed"),
+        selected_name("search"),
+    )
+
+
+class ResultCache:
+    """
+    Finished batches (and card text) keyed by result_key().
+    Entries live for ttl_s in a process-wide LRU, shared by every Streamlit session,
+    and optionally in a SQLite file shared by every worker process.
+    """
+
+    def __init__(self, max_items: int, ttl_s: float, path: Optional[str] = None, max_rows: Optional[int] = None):
+        self.ttl_s = ttl_s
+        self.memory = TTLCache(max_items, ttl_s=ttl_s)
+        self.store = SqliteStore(path, table="results", max_age_s=ttl_s, max_rows=max_rows) if path else None
+
+    def _entry(self, key: str) -> Optional[dict]:
+        hit = self.memory.get(key)
+        if hit is not None:
+            return json.loads(hit[0])
+        if self.store is None:
+            return None
+
+        row = self.store.get_entry(key)
+        if row is None or time.time() - row[1] > self.ttl_s:
+            return None
+        blob, created_at = row
+        self.memory.put(key, blob, created_at=created_at)
+        return json.loads(blob)
+
+    def get(self, key: str, with_cards: bool = False) -> Optional[Tuple[GiftBatch, Optional[str]]]:
+        """Returns (batch, cards) or None; with_cards=True only accepts entries that include cards."""
+        entry = self._entry(key)
+        if entry is None or (with_cards and entry.get("cards") is None):
+            return None
+        # Parsed fresh on every hit, so callers can mutate what they get back
+        return GiftBatch.model_validate(entry["batch"]), entry.get("cards")
+
+    def put(self, key: str, batch: GiftBatch, cards: Optional[str] = None) -> None:
+        if not batch.ideas:
+            return
+        if cards is None:
+            # A batch-only result never replaces one that already has cards
+            existing = self._entry(key)
+            if existing is not None and existing.get("cards") is not None:
+                return
+
+        now = time.time()
+        blob = json.dumps({"batch": batch.model_dump(), "cards": cards}).encode("utf-8")
+        self.memory.put(key, blob, created_at=now)
+        if self.store is not None:
+            self.store.put_many([(key, blob)], created_at=now)
+
+    def clear(self) -> None:
+        """Empties the in-memory layer (the SQLite file keeps its entries until they expire)."""
+        self.memory.clear()
+
+
+result_cache = ResultCache(RESULT_CACHE_MAX_ITEMS, RESULT_CACHE_TTL_S, RESULT_CACHE_PATH or None, RESULT_CACHE_DB_MAX_ROWS)
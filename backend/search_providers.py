@@ -1,8 +1,32 @@
-from typing import List
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
 from .models import SearchResult
-from .config import TAVILY_API_KEY, MAX_RESULTS_PER_QUERY
+from .config import TAVILY_API_KEY, TAVILY_SEARCH_URL, MAX_RESULTS_PER_QUERY, SEARCH_MAX_IN_FLIGHT, SEARCH_TIMEOUT_S, BLOCKING_POOL_SIZE
+from .config import SEARCH_CACHE_TTL_S, SEARCH_CACHE_STALE_S, SEARCH_CACHE_MAX_ITEMS, SEARCH_CACHE_PATH
+from .config import SEARCH_CACHE_DB_MAX_ROWS
+from .concurrency import gather_bounded, run_sync
+from .cache import TTLCache, SqliteStore, content_key
+from .tracing import count, span
+from .providers import SearchProvider, search_provider, selected_name
 import re
 
+_search_cache = TTLCache(SEARCH_CACHE_MAX_ITEMS, ttl_s=SEARCH_CACHE_TTL_S, stale_s=SEARCH_CACHE_STALE_S)
+_search_store = SqliteStore(
+    SEARCH_CACHE_PATH,
+    table="search_results",
+    max_age_s=SEARCH_CACHE_TTL_S + SEARCH_CACHE_STALE_S,
+    max_rows=SEARCH_CACHE_DB_MAX_ROWS,
+) if SEARCH_CACHE_PATH else None
+
+# Background refreshes for stale entries; one in flight per key
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="giftbot-search-refresh")
+_refreshing: set = set()
+_refreshing_lock = threading.Lock()
+
 
 def _clean_snippet(s: str) -> str:
     s = re.sub(r"\s+", " ", (s or "").strip())
@@ -11,25 +35,210 @@ def _clean_snippet(s: str) -> str:
 
 def search_web(query: str) -> List[SearchResult]:
     """
-    Uses Tavily when key exists, otherwise falls back to DuckDuckGo.
+    Uses the configured search provider (by default Tavily when key exists, otherwise DuckDuckGo).
     Pinterest/Etsy pages are not fetched. Only search results are used.
+    Answers are cached; a stale answer is returned at once and refreshed in the background.
     """
-    if TAVILY_API_KEY:
-        return _search_tavily(query)
-    return _search_duckduckgo(query)
+    with span("search", query=query, provider=_provider_name()) as attrs:
+        count("searches")
+        key = _cache_key(query)
+        hit = _cache_get(key)
+        if hit is not None:
+            results, is_stale = hit
+            attrs["cache"] = "stale" if is_stale else "hit"
+            count("search_cache_hits")
+            if is_stale:
+                _refresh_in_background(key, query)
+            return list(results)
+
+        attrs["cache"] = "miss"
+        count("search_live_calls")
+        results = _search_live(query)
+        attrs["results"] = len(results)
+        _cache_put(key, results)
+        return results
+
+
+def _search_live(query: str) -> List[SearchResult]:
+    return search_provider().search(query)
+
+
+def _provider_name() -> str:
+    return selected_name("search")
+
+
+def _normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", (query or "").strip().lower())
+
+
+def _cache_key(query: str) -> str:
+    return content_key(_normalize_query(query), _provider_name(), str(MAX_RESULTS_PER_QUERY))
+
+
+def _cache_get(key: str) -> Optional[tuple]:
+    hit = _search_cache.get(key)
+    if hit is not None or _search_store is None:
+        return hit
+
+    entry = _search_store.get_entry(key)
+    if entry is None:
+        return None
+    blob, created_at = entry
+    results = [SearchResult(**r) for r in json.loads(blob)]
+    # Warming memory with the original timestamp so TTL keeps counting from the real fetch
+    _search_cache.put(key, results, created_at=created_at)
+    return _search_cache.get(key)
+
+
+def _cache_put(key: str, results: List[SearchResult]) -> None:
+    # Empty answers are usually transient provider hiccups, so they are not cached
+    if not results:
+        return
+    now = time.time()
+    _search_cache.put(key, results, created_at=now)
+    if _search_store is not None:
+        blob = json.dumps([r.model_dump() for r in results]).encode("utf-8")
+        _search_store.put_many([(key, blob)], created_at=now)
+
+
+def _refresh_in_background(key: str, query: str) -> None:
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def _run() -> None:
+        try:
+            _cache_put(key, _search_live(query))
+        except Exception:
+            pass
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    _refresh_pool.submit(_run)
+
+
+async def asearch_web(query: str) -> List[SearchResult]:
+    """Runs search_web on a worker thread so many queries can be in flight at once."""
+    return await asyncio.to_thread(search_web, query)
+
+
+async def asearch_many(queries: List[str]) -> List[List[SearchResult]]:
+    """
+    Runs all queries concurrently (bounded by SEARCH_MAX_IN_FLIGHT).
+    Results come back in query order; a query that exceeds SEARCH_TIMEOUT_S yields [].
+    """
+    return await gather_bounded(
+        asearch_web,
+        queries,
+        max_in_flight=SEARCH_MAX_IN_FLIGHT,
+        timeout=SEARCH_TIMEOUT_S,
+        on_timeout=lambda q: [],
+    )
+
+
+def search_many(queries: List[str]) -> List[List[SearchResult]]:
+    """Blocking version of asearch_many."""
+    return run_sync(asearch_many(queries))
+
+
+class _ClientRegistry:
+    """
+    Creates each search client once and hands the same one out afterwards.
+    Process-wide clients must be thread-safe; per-thread clients are for SDKs that are not.
+    """
+
+    def __init__(self):
+        self._shared: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def shared(self, name: str, factory: Callable[[], Any]) -> Any:
+        client = self._shared.get(name)
+        if client is None:
+            with self._lock:
+                client = self._shared.get(name)
+                if client is None:
+                    client = factory()
+                    self._shared[name] = client
+        return client
+
+    def per_thread(self, name: str, factory: Callable[[], Any]) -> Any:
+        client = getattr(self._local, name, None)
+        if client is None:
+            client = factory()
+            setattr(self._local, name, client)
+        return client
+
+    def drop_per_thread(self, name: str) -> None:
+        if hasattr(self._local, name):
+            delattr(self._local, name)
+
+
+_clients = _ClientRegistry()
+
+
+def _tavily_session() -> Any:
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    # One keep-alive pool for all Tavily calls in the process, sized for the search worker threads
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=BLOCKING_POOL_SIZE))
+    session.headers.update({"Content-Type": "application/json"})
+    return session
+
+
+def _tavily_detail(resp: Any) -> str:
+    try:
+        detail = resp.json().get("detail")
+    except ValueError:
+        return resp.text[:200]
+    if isinstance(detail, dict):
+        detail = detail.get("error")
+    return str(detail or resp.text[:200])
+
+
+def _ddgs_client() -> Any:
+    from duckduckgo_search import DDGS
+
+    return DDGS(timeout=int(SEARCH_TIMEOUT_S))
+
+
+class TavilyError(RuntimeError):
+    """A Tavily request the service refused (bad key, quota, malformed request)."""
 
 
 def _search_tavily(query: str) -> List[SearchResult]:
-    from tavily import TavilyClient
-
-    client = TavilyClient(api_key=TAVILY_API_KEY)
-    res = client.search(
-        query=query,
-        search_depth="basic",
-        max_results=MAX_RESULTS_PER_QUERY,
-        include_answer=False,
-        include_raw_content=False,
+    """
+    POST /search on the Tavily REST API over a pooled keep-alive session (the tavily-python SDK
+    opens a new connection per call). The key goes in the Authorization header, not the body.
+    """
+    if not TAVILY_API_KEY:
+        raise TavilyError("TAVILY_API_KEY not set.")
+    session = _clients.shared("tavily", _tavily_session)
+    resp = session.post(
+        TAVILY_SEARCH_URL,
+        headers={"Authorization": f"Bearer {TAVILY_API_KEY}"},
+        json={
+            "query": query,
+            "search_depth": "basic",
+            "topic": "general",
+            "max_results": MAX_RESULTS_PER_QUERY,
+            "include_answer": False,
+            "include_raw_content": False,
+            "include_images": False,
+        },
+        timeout=SEARCH_TIMEOUT_S,
     )
+    if resp.status_code in (401, 403):
+        raise TavilyError(f"Tavily rejected TAVILY_API_KEY (HTTP {resp.status_code}).")
+    if resp.status_code in (400, 429, 432, 433):
+        # 429 = rate limited, 432/433 = plan or pay-as-you-go limit reached; the body says which
+        raise TavilyError(f"Tavily HTTP {resp.status_code}: {_tavily_detail(resp)}")
+    resp.raise_for_status()
+    res = resp.json()
 
     out: List[SearchResult] = []
     for r in (res.get("results") or []):
@@ -45,17 +254,37 @@ def _search_tavily(query: str) -> List[SearchResult]:
 
 
 def _search_duckduckgo(query: str) -> List[SearchResult]:
-    from duckduckgo_search import DDGS
+    # DDGS is not thread-safe, so each worker thread keeps its own (and its connection pool)
+    ddgs = _clients.per_thread("ddgs", _ddgs_client)
 
     out: List[SearchResult] = []
-    with DDGS() as ddgs:
-        for r in ddgs.text(query, max_results=MAX_RESULTS_PER_QUERY):
-            out.append(
-                SearchResult(
-                    title=r.get("title") or "Untitled",
-                    url=r.get("href") or "",
-                    snippet=_clean_snippet(r.get("body") or ""),
-                    source="duckduckgo",
-                )
+    try:
+        hits = ddgs.text(query, max_results=MAX_RESULTS_PER_QUERY)
+    except Exception:
+        # DDGS refuses every later call after one failure, so the next query gets a fresh client
+        _clients.drop_per_thread("ddgs")
+        raise
+    for r in hits:
+        out.append(
+            SearchResult(
+                title=r.get("title") or "Untitled",
+                url=r.get("href") or "",
+                snippet=_clean_snippet(r.get("body") or ""),
+                source="duckduckgo",
             )
+        )
     return [x for x in out if x.url]
+
+
+class TavilySearch(SearchProvider):
+    name = "tavily"
+
+    def search(self, query: str) -> List[SearchResult]:
+        return _search_tavily(query)
+
+
+class DuckDuckGoSearch(SearchProvider):
+    name = "duckduckgo"
+
+    def search(self, query: str) -> List[SearchResult]:
+        return _search_duckduckgo(query)
@@ -0,0 +1,122 @@
+# backend/semantic_cache.py
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from .config import SEMANTIC_CACHE_MIN_SIM, SEMANTIC_CACHE_BUDGET_TOLERANCE
+from .config import SEMANTIC_CACHE_MAX_ITEMS, SEMANTIC_CACHE_TTL_S
+from .models import SearchResult
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+@dataclass
+class EvidenceEntry:
+    """Search evidence gathered for one served profile."""
+    vector: "np.ndarray"
+    budget_usd: Optional[float]
+    queries: List[str]
+    results: List[SearchResult]
+    created_at: float
+
+
+def budgets_compatible(a: Optional[float], b: Optional[float], tolerance: float) -> bool:
+    """Budgets within `tolerance` of the larger one (e.g. 45 vs 50 at 0.2); unknown only matches unknown."""
+    if a is None or b is None:
+        return a is None and b is None
+    hi = max(float(a), float(b))
+    return hi == 0 or abs(float(a) - float(b)) <= tolerance * hi
+
+
+class _Partition:
+    """Entries sharing one vector space, with a lazily rebuilt (n, dim) matrix for brute-force search."""
+
+    def __init__(self):
+        self.entries: List[EvidenceEntry] = []
+        self._matrix: Optional["np.ndarray"] = None
+
+    def matrix(self) -> "np.ndarray":
+        import numpy as np
+
+        if self._matrix is None:
+            self._matrix = np.stack([e.vector for e in self.entries])
+        return self._matrix
+
+    def append(self, entry: EvidenceEntry, max_items: int) -> None:
+        self.entries.append(entry)
+        if len(self.entries) > max_items:
+            del self.entries[: len(self.entries) - max_items]
+        self._matrix = None
+
+    def prune(self, now: float, ttl_s: float) -> None:
+        live = [e for e in self.entries if now - e.created_at <= ttl_s]
+        if len(live) != len(self.entries):
+            self.entries = live
+            self._matrix = None
+
+
+class SemanticEvidenceCache:
+    """
+    Evidence (planned queries + search results) of recently served profiles, searched by
+    profile-embedding similarity. A new profile close enough to a served one, with a
+    compatible budget, reuses its evidence instead of planning and searching again.
+    Partitioned by (embedding model, search provider) so vectors and sources never mix.
+    """
+
+    def __init__(self, max_items: int, ttl_s: float, min_sim: float, budget_tolerance: float):
+        self.max_items = max(0, int(max_items))
+        self.ttl_s = ttl_s
+        self.min_sim = min_sim
+        self.budget_tolerance = budget_tolerance
+        self._parts: Dict[Tuple[str, str], _Partition] = {}
+        self._lock = threading.Lock()
+
+    def lookup(
+        self, space: Tuple[str, str], vector: "np.ndarray", budget_usd: Optional[float]
+    ) -> Optional[Tuple[EvidenceEntry, float]]:
+        """Best compatible entry above min_sim as (entry, similarity); `vector` must be normalized."""
+        import numpy as np
+
+        with self._lock:
+            part = self._parts.get(space)
+            if part is None:
+                return None
+            part.prune(time.time(), self.ttl_s)
+            if not part.entries:
+                return None
+            sims = part.matrix() @ vector
+            entries = list(part.entries)
+
+        # Most similar first; the budget check usually passes on the first candidate
+        for i in np.argsort(-sims):
+            if sims[i] < self.min_sim:
+                break
+            if budgets_compatible(entries[i].budget_usd, budget_usd, self.budget_tolerance):
+                return entries[i], float(sims[i])
+        return None
+
+    def add(
+        self,
+        space: Tuple[str, str],
+        vector: "np.ndarray",
+        budget_usd: Optional[float],
+        queries: List[str],
+        results: List[SearchResult],
+    ) -> None:
+        if self.max_items == 0 or not results:
+            return
+        entry = EvidenceEntry(vector, budget_usd, list(queries), list(results), time.time())
+        with self._lock:
+            self._parts.setdefault(space, _Partition()).append(entry, self.max_items)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._parts.clear()
+
+
+evidence_cache = SemanticEvidenceCache(
+    SEMANTIC_CACHE_MAX_ITEMS, SEMANTIC_CACHE_TTL_S, SEMANTIC_CACHE_MIN_SIM, SEMANTIC_CACHE_BUDGET_TOLERANCE
+)
@@ -0,0 +1,139 @@
+# backend/tracing.py
+#
+# Per-request timing and cost tracing.
+#   with trace("generate_batch") as t:      # one per request, opened by the caller
+#       with span("plan_queries"): ...      # anywhere below it, including async tasks and worker threads
+#       count("llm_input_tokens", 123)
+# Without an open trace, span() and count() do nothing.
+
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from .config import TRACE_LOG
+
+logger = logging.getLogger("giftbot.trace")
+_handler_lock = threading.Lock()
+
+
+def _trace_logger() -> logging.Logger:
+    """
+    giftbot.trace, with a stderr handler of its own attached on first use unless the host
+    application has already configured one, so trace lines are not lost at the root's
+    default WARNING level.
+    """
+    if not logger.handlers:
+        with _handler_lock:
+            if not logger.handlers:
+                handler = logging.StreamHandler()
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+                # Our handler already writes the line; the root would print it a second time
+                logger.propagate = False
+    return logger
+
+
+@dataclass
+class SpanRecord:
+    name: str
+    start_ms: float
+    duration_ms: float
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+
+class Trace:
+    """Spans and counters collected for one request."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.spans: List[SpanRecord] = []
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000.0
+
+    def add_span(self, span: SpanRecord) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def count(self, key: str, n: float = 1) -> None:
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def stage_totals(self) -> Dict[str, float]:
+        """Total milliseconds per span name."""
+        out: Dict[str, float] = {}
+        for s in self.spans:
+            out[s.name] = out.get(s.name, 0.0) + s.duration_ms
+        return out
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = [asdict(s) for s in sorted(self.spans, key=lambda s: s.start_ms)]
+            counters = dict(self.counters)
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "counters": counters,
+            "stages_ms": self.stage_totals(),
+            "spans": spans,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), default=str)
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("giftbot_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def trace(name: str = "request") -> Iterator[Trace]:
+    """Opens a request trace; on exit it is logged as one JSON line on the giftbot.trace logger."""
+    t = Trace(name)
+    token = _current.set(t)
+    try:
+        yield t
+    finally:
+        t.duration_ms = t.elapsed_ms()
+        _current.reset(token)
+        if TRACE_LOG:
+            _trace_logger().info(t.to_json())
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+    """Times a block. The yielded dict can be filled with extra attributes (tokens, cache hits...)."""
+    t = _current.get()
+    if t is None:
+        yield attrs
+        return
+
+    start = t.elapsed_ms()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        t.add_span(SpanRecord(name=name, start_ms=start, duration_ms=t.elapsed_ms() - start, attrs=attrs))
+
+
+def count(key: str, n: float = 1) -> None:
+    t = _current.get()
+    if t is not None:
+        t.count(key, n)
@@ -0,0 +1,244 @@
+# backend/vector_index.py
+#
+# Vector indexes over normalized float32 embeddings (inner product = cosine similarity).
+#   ExactIndex: brute-force scoring with argpartition; the baseline and the right choice below ~50k docs.
+#   IVFIndex:   k-means coarse quantizer + inverted lists; scans only the n_probe closest lists.
+# Both support incremental add() and persist to a directory of .npy files that load memory-mapped,
+# so a large corpus is paged in on demand instead of read up front.
+
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import VECTOR_INDEX_KIND, IVF_N_LISTS, IVF_N_PROBE
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first; O(n + k log k) instead of a full sort."""
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        part = np.argpartition(-scores, k - 1)[:k]
+    else:
+        part = np.arange(n)
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def _as_matrix(vectors) -> np.ndarray:
+    M = np.asarray(vectors, dtype=np.float32)
+    return M.reshape(1, -1) if M.ndim == 1 else M
+
+
+class VectorIndex:
+    """Common storage: ids plus a growable (n, dim) float32 buffer."""
+
+    kind = "base"
+
+    def __init__(self, dim: int):
+        self.dim = int(dim)
+        self.ids: List[str] = []
+        self._buf = np.empty((0, self.dim), dtype=np.float32)
+        self._n = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._buf[: self._n]
+
+    def _append(self, ids: Sequence[str], vectors) -> np.ndarray:
+        M = _as_matrix(vectors)
+        if M.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dim {self.dim}, got {M.shape[1]}")
+        if len(ids) != M.shape[0]:
+            raise ValueError("ids and vectors differ in length")
+
+        need = self._n + M.shape[0]
+        if need > self._buf.shape[0] or not self._buf.flags.writeable:
+            # Doubling keeps appends amortized O(1); this also copies a memory-mapped buffer into RAM
+            grown = np.empty((max(need, 2 * self._buf.shape[0], 1024), self.dim), dtype=np.float32)
+            grown[: self._n] = self._buf[: self._n]
+            self._buf = grown
+        self._buf[self._n:need] = M
+        self.ids.extend(ids)
+        start, self._n = self._n, need
+        return np.arange(start, need)
+
+    def add(self, ids: Sequence[str], vectors) -> None:
+        raise NotImplementedError
+
+    def search(self, query, k: int) -> List[Tuple[str, float]]:
+        """Top k (id, score) pairs, best first."""
+        raise NotImplementedError
+
+    # Persistence
+
+    def _save_extra(self, path: str) -> Dict:
+        return {}
+
+    def _load_extra(self, path: str, meta: Dict, mmap: bool) -> None:
+        pass
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            np.save(os.path.join(path, "vectors.npy"), self.vectors)
+            with open(os.path.join(path, "ids.json"), "w", encoding="utf-8") as f:
+                json.dump(self.ids, f)
+            meta = {"kind": self.kind, "dim": self.dim, "count": self._n}
+            meta.update(self._save_extra(path))
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "VectorIndex":
+        """Loads a saved index; with mmap the vectors stay on disk until touched."""
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        kind = {c.kind: c for c in (ExactIndex, IVFIndex)}[meta["kind"]]
+        index = kind.__new__(kind)
+        VectorIndex.__init__(index, meta["dim"])
+        with open(os.path.join(path, "ids.json"), "r", encoding="utf-8") as f:
+            index.ids = json.load(f)
+        index._buf = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r" if mmap else None)
+        index._n = meta["count"]
+        index._load_extra(path, meta, mmap)
+        return index
+
+
+class ExactIndex(VectorIndex):
+    kind = "exact"
+
+    def add(self, ids: Sequence[str], vectors) -> None:
+        with self._lock:
+            self._append(ids, vectors)
+
+    def search(self, query, k: int) -> List[Tuple[str, float]]:
+        q = np.asarray(query, dtype=np.float32).reshape(-1)
+        with self._lock:
+            scores = self.vectors @ q
+            idx = top_k_indices(scores, k)
+            return [(self.ids[i], float(scores[i])) for i in idx]
+
+
+def _kmeans(X: np.ndarray, n_clusters: int, iters: int = 12, seed: int = 0) -> np.ndarray:
+    """Spherical k-means (cosine); returns normalized (n_clusters, dim) centroids."""
+    rng = np.random.default_rng(seed)
+    C = X[rng.choice(X.shape[0], size=n_clusters, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(X @ C.T, axis=1)
+        for c in range(n_clusters):
+            members = X[assign == c]
+            if len(members):
+                C[c] = members.sum(axis=0)
+            else:
+                # Re-seeding empty clusters from random points
+                C[c] = X[rng.integers(X.shape[0])]
+        C /= np.linalg.norm(C, axis=1, keepdims=True) + 1e-9
+    return C
+
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted-file index. Until `train_size` vectors exist it answers exactly; then it clusters
+    a sample into n_lists centroids and every vector (existing and later) goes to its nearest
+    list. A query scores the centroids, scans the n_probe best lists and ranks those exactly.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, dim: int, n_lists: int = 256, n_probe: int = 16, train_size: Optional[int] = None):
+        super().__init__(dim)
+        self.n_lists = int(n_lists)
+        self.n_probe = int(n_probe)
+        self.train_size = int(train_size) if train_size else 40 * self.n_lists
+        self.centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def _assign(self, X: np.ndarray, rows: np.ndarray) -> None:
+        # Chunked so assignment memory stays bounded at large n
+        grouped: Dict[int, List[np.ndarray]] = {}
+        for s in range(0, len(rows), 65_536):
+            chunk = rows[s:s + 65_536]
+            nearest = np.argmax(X[s:s + 65_536] @ self.centroids.T, axis=1)
+            for c in np.unique(nearest):
+                grouped.setdefault(int(c), []).append(chunk[nearest == c])
+        for c, parts in grouped.items():
+            self._lists[c] = np.concatenate([self._lists[c]] + parts)
+
+    def train(self, sample_size: Optional[int] = None) -> None:
+        X = self.vectors
+        sample_size = min(len(X), sample_size or self.train_size)
+        rng = np.random.default_rng(0)
+        sample = X[np.sort(rng.choice(len(X), size=sample_size, replace=False))]
+        self.centroids = _kmeans(np.ascontiguousarray(sample), min(self.n_lists, sample_size))
+        self._lists = [np.empty(0, dtype=np.int64) for _ in range(len(self.centroids))]
+        self._assign(X, np.arange(len(X)))
+
+    def add(self, ids: Sequence[str], vectors) -> None:
+        with self._lock:
+            rows = self._append(ids, vectors)
+            if self.trained:
+                self._assign(self._buf[rows[0]:rows[-1] + 1], rows)
+            elif self._n >= self.train_size:
+                self.train()
+
+    def search(self, query, k: int) -> List[Tuple[str, float]]:
+        q = np.asarray(query, dtype=np.float32).reshape(-1)
+        with self._lock:
+            if not self.trained:
+                scores = self.vectors @ q
+                idx = top_k_indices(scores, k)
+                return [(self.ids[i], float(scores[i])) for i in idx]
+
+            probe = top_k_indices(self.centroids @ q, self.n_probe)
+            rows = np.concatenate([self._lists[c] for c in probe])
+            if len(rows) == 0:
+                return []
+            scores = self._buf[rows] @ q
+            idx = top_k_indices(scores, k)
+            return [(self.ids[rows[i]], float(scores[i])) for i in idx]
+
+    def _save_extra(self, path: str) -> Dict:
+        extra = {"n_lists": self.n_lists, "n_probe": self.n_probe, "train_size": self.train_size}
+        if self.trained:
+            np.save(os.path.join(path, "centroids.npy"), self.centroids)
+            # Lists stored flat with offsets, so they load as two arrays
+            sizes = np.array([len(l) for l in self._lists], dtype=np.int64)
+            flat = np.concatenate(self._lists) if self._lists else np.empty(0, dtype=np.int64)
+            np.save(os.path.join(path, "list_rows.npy"), flat)
+            np.save(os.path.join(path, "list_offsets.npy"), np.concatenate([[0], np.cumsum(sizes)]))
+        return extra
+
+    def _load_extra(self, path: str, meta: Dict, mmap: bool) -> None:
+        self.n_lists = meta["n_lists"]
+        self.n_probe = meta["n_probe"]
+        self.train_size = meta["train_size"]
+        self.centroids = None
+        self._lists = []
+        centroids = os.path.join(path, "centroids.npy")
+        if os.path.exists(centroids):
+            self.centroids = np.load(centroids)
+            flat = np.load(os.path.join(path, "list_rows.npy"), mmap_mode="r" if mmap else None)
+            offsets = np.load(os.path.join(path, "list_offsets.npy"))
+            self._lists = [np.asarray(flat[offsets[i]:offsets[i + 1]]) for i in range(len(offsets) - 1)]
+
+
+def new_index(dim: int, kind: Optional[str] = None) -> VectorIndex:
+    """Empty index of the configured kind (VECTOR_INDEX_KIND unless given)."""
+    kind = kind or VECTOR_INDEX_KIND
+    if kind == "exact":
+        return ExactIndex(dim)
+    if kind == "ivf":
+        return IVFIndex(dim, n_lists=IVF_N_LISTS, n_probe=IVF_N_PROBE)
+    raise ValueError(f"Unknown vector index kind: {kind!r}")
@@ -0,0 +1,84 @@
+# benchmarks/bench_domains.py
+#
+# Micro-benchmark of evidence-URL domain weighting as the retailer list grows.
+#   python -m benchmarks.bench_domains
+#   python -m benchmarks.bench_domains --domains 100,5000,50000 --urls 200000
+# "linear" is the previous approach (urlparse + endswith scan over the list); "table" is the
+# suffix-hash DomainTable, measured with a cold and a warm host cache.
+
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict, List
+from urllib.parse import urlparse
+
+from backend import domains
+from backend.config import DEFAULT_WEIGHT, RETAIL_WEIGHT
+from backend.domains import DomainTable
+
+_REAL = ["etsy.com", "pinterest.com", "amazon.com", "target.com", "walmart.com", "foo-blog.org", "reddit.com"]
+
+
+def _linear_weight(url: str, retail: List[str]) -> float:
+    try:
+        host = (urlparse(url).hostname or "").lower()
+    except Exception:
+        return DEFAULT_WEIGHT
+    if any(host.endswith(d) for d in retail):
+        return RETAIL_WEIGHT
+    return DEFAULT_WEIGHT
+
+
+def _workload(n_urls: int, n_hosts: int, retail: List[str], seed: int = 0) -> List[str]:
+    # Hosts repeat heavily, as they do across search results
+    rng = random.Random(seed)
+    hosts = [rng.choice(_REAL + retail[:50]) for _ in range(n_hosts)]
+    hosts = [f"www.{h}" if rng.random() < 0.5 else h for h in hosts]
+    return [f"https://{rng.choice(hosts)}/p/{rng.randrange(10**6)}?ref=x" for _ in range(n_urls)]
+
+
+def _per_url_ns(fn, urls: List[str]) -> float:
+    t0 = time.perf_counter()
+    for u in urls:
+        fn(u)
+    return (time.perf_counter() - t0) / len(urls) * 1e9
+
+
+def run(n_domains: int, n_urls: int, n_hosts: int) -> Dict[str, Any]:
+    retail = [f"shop{i}.com" for i in range(n_domains)]
+    urls = _workload(n_urls, n_hosts, retail)
+
+    linear = _per_url_ns(lambda u: _linear_weight(u, retail), urls[: max(1000, n_urls // max(1, n_domains // 100))])
+
+    domains.set_domain_table(DomainTable({d: RETAIL_WEIGHT for d in retail}))
+    cold = _per_url_ns(domains.domain_weight, urls[:n_hosts])
+    warm = _per_url_ns(domains.domain_weight, urls)
+    return {
+        "domains": n_domains,
+        "linear_ns": round(linear),
+        "table_cold_ns": round(cold),
+        "table_warm_ns": round(warm),
+        "speedup_warm": round(linear / warm, 1),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Domain weighting micro-benchmark")
+    ap.add_argument("--domains", default="12,1000,10000", help="comma-separated retailer list sizes")
+    ap.add_argument("--urls", type=int, default=100_000)
+    ap.add_argument("--hosts", type=int, default=2_000, help="distinct hosts in the workload")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = ap.parse_args()
+
+    report = [run(int(n), args.urls, args.hosts) for n in args.domains.split(",") if n.strip()]
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{'domains':>8}{'linear ns/url':>16}{'table cold':>12}{'table warm':>12}{'speedup':>9}")
+    for r in report:
+        print(f"{r['domains']:>8}{r['linear_ns']:>16}{r['table_cold_ns']:>12}{r['table_warm_ns']:>12}{r['speedup_warm']:>9}")
+
+
+if __name__ == "__main__":
+    main()
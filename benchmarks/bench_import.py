@@ -0,0 +1,83 @@
+# benchmarks/bench_import.py
+#
+# Cold import time of the backend modules, each measured in fresh interpreters.
+#   python -m benchmarks.bench_import
+#   python -m benchmarks.bench_import --runs 10 --max-ms 400     (non-zero exit over budget, for CI)
+# Also fails if importing a module pulls in a heavy dependency that should only load on first use,
+# or writes anything (cache files, directories) to the working directory.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+DEFAULT_MODULES = ["backend.models", "backend.rag", "backend.recommender"]
+
+# Loaded on first use (client construction, first search, first embedding), never at import
+DEFERRED = ["openai", "numpy", "streamlit", "tavily", "duckduckgo_search", "requests"]
+
+_SNIPPET = """
+import json, os, sys, time
+t0 = time.perf_counter()
+import {module}
+ms = (time.perf_counter() - t0) * 1000.0
+print(json.dumps({{"ms": ms, "loaded": [m for m in {deferred!r} if m in sys.modules], "files": os.listdir(".")}}))
+"""
+
+
+def _measure_once(module: str) -> Dict[str, Any]:
+    code = _SNIPPET.format(module=module, deferred=DEFERRED)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")]))}
+    # An empty working directory, so any file the import creates shows up
+    with tempfile.TemporaryDirectory() as cwd:
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=cwd, env=env)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure(module: str, runs: int) -> Dict[str, Any]:
+    samples = [_measure_once(module) for _ in range(runs)]
+    times = [s["ms"] for s in samples]
+    return {
+        "module": module,
+        "runs": runs,
+        "median_ms": round(statistics.median(times), 1),
+        "min_ms": round(min(times), 1),
+        "max_ms": round(max(times), 1),
+        "eager_deps": samples[0]["loaded"],
+        "files_created": samples[0]["files"],
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Cold import time of backend modules")
+    ap.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--max-ms", type=float, default=None, help="fail if any median exceeds this")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = ap.parse_args()
+
+    report: List[Dict[str, Any]] = [measure(m, args.runs) for m in args.modules]
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'module':<24}{'median':>10}{'min':>10}{'max':>10}  eager deps / files created")
+        for r in report:
+            print(f"{r['module']:<24}{r['median_ms']:>10}{r['min_ms']:>10}{r['max_ms']:>10}  "
+                  f"{', '.join(r['eager_deps']) or '-'} / {', '.join(r['files_created']) or '-'}")
+
+    failed = [r["module"] for r in report if r["eager_deps"] or r["files_created"]]
+    if args.max_ms is not None:
+        failed += [r["module"] for r in report if r["median_ms"] > args.max_ms]
+    if failed:
+        print(f"FAIL: {', '.join(sorted(set(failed)))}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
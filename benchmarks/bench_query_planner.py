@@ -0,0 +1,117 @@
+# benchmarks/bench_query_planner.py
+#
+# Rule-based vs. LLM query planning, per benchmark profile.
+#   python -m benchmarks.bench_query_planner --llm-ms 800 --search-ms 400
+#   python -m benchmarks.bench_query_planner --fixtures fixtures.json
+# Latency is planning alone and planning + searching. Overlap compares the plans' search terms
+# (Jaccard of the lowercase words) and what each plan retrieves: Jaccard of the result URL sets,
+# and how many of the EVIDENCE_TOP_K documents closest to the profile (the ones idea extraction
+# sees first) both plans share. Synthetic search results are derived from the query text, so two
+# different plans never share a URL; result overlap is only computed with --fixtures (n/a otherwise).
+
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Set
+
+from benchmarks.harness import Fixtures, Latency, clear_caches, install
+from benchmarks.profiles import PROFILES
+
+from backend.config import EVIDENCE_TOP_K
+from backend.domains import url_host
+from backend.models import GiftProfile, SearchResult
+from backend.rag import EmbeddingContext, build_docs, top_k_by_similarity
+from backend.recommender import _profile_text, gather_results, plan_queries
+
+MODES = ("rules", "llm")
+
+
+def _site_share(results: List[SearchResult], site: str) -> float:
+    return sum(url_host(r.url).endswith(site) for r in results) / max(1, len(results))
+
+
+def _terms(queries: List[str]) -> Set[str]:
+    return {w for q in queries for w in q.lower().split()}
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    return round(len(a & b) / max(1, len(a | b)), 3)
+
+
+def _top_urls(profile: GiftProfile, results: List[SearchResult], ctx: EmbeddingContext) -> Set[str]:
+    return {d.url for d in top_k_by_similarity(_profile_text(profile), build_docs(results), k=EVIDENCE_TOP_K, ctx=ctx)}
+
+
+def run_profile(profile: GiftProfile, compare_results: bool = True) -> Dict[str, Any]:
+    row: Dict[str, Any] = {"profile": _profile_text(profile).replace("\n", "; ")}
+    results: Dict[str, List[SearchResult]] = {}
+    for mode in MODES:
+        clear_caches()
+        t0 = time.perf_counter()
+        queries = plan_queries(profile, mode=mode)
+        planned = time.perf_counter()
+        results[mode] = gather_results(queries)
+        done = time.perf_counter()
+        row[mode] = {
+            "plan_ms": round((planned - t0) * 1000.0, 3),
+            "plan_search_ms": round((done - t0) * 1000.0, 1),
+            "queries": queries,
+            "results": len(results[mode]),
+            "pinterest_share": round(_site_share(results[mode], "pinterest.com"), 2),
+            "etsy_share": round(_site_share(results[mode], "etsy.com"), 2),
+        }
+
+    row["term_jaccard"] = _jaccard(*(_terms(row[m]["queries"]) for m in MODES))
+    row["url_jaccard"] = row["top_k_overlap"] = None
+    if compare_results:
+        row["url_jaccard"] = _jaccard(*({r.url for r in results[m]} for m in MODES))
+        ctx = EmbeddingContext()
+        top_a, top_b = (_top_urls(profile, results[m], ctx) for m in MODES)
+        row["top_k_overlap"] = round(len(top_a & top_b) / max(1, min(len(top_a), len(top_b))), 3)
+    return row
+
+
+def _fmt(value: Any) -> str:
+    return "n/a" if value is None else str(value)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Rule-based vs. LLM query planner benchmark")
+    ap.add_argument("--llm-ms", type=float, default=600.0, help="injected latency per LLM call")
+    ap.add_argument("--embed-ms", type=float, default=0.0, help="injected latency per embeddings call")
+    ap.add_argument("--search-ms", type=float, default=350.0, help="injected latency per live search")
+    ap.add_argument("--fixtures", default=None, help="recorded fixtures JSON to replay (synthetic otherwise)")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = ap.parse_args()
+
+    install(Latency(args.llm_ms, args.embed_ms, args.search_ms), Fixtures(args.fixtures))
+    # Synthetic results never overlap across different queries, so only fixtures are compared
+    report = [run_profile(p, compare_results=bool(args.fixtures)) for p in PROFILES]
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{'profile':<44}{'plan ms':>16}{'plan+search ms':>18}{'pin/etsy share':>18}{'terms J':>9}{'url J':>7}{'top-k':>7}")
+    print(f"{'':<44}{'rules':>8}{'llm':>8}{'rules':>9}{'llm':>9}{'rules':>9}{'llm':>9}")
+    for r in report:
+        ru, ll = r["rules"], r["llm"]
+        print(
+            f"{r['profile'][:43]:<44}{ru['plan_ms']:>8}{ll['plan_ms']:>8}"
+            f"{ru['plan_search_ms']:>9}{ll['plan_search_ms']:>9}"
+            f"{ru['pinterest_share']:>5}/{ru['etsy_share']:<3}{ll['pinterest_share']:>5}/{ll['etsy_share']:<3}"
+            f"{r['term_jaccard']:>9}{_fmt(r['url_jaccard']):>7}{_fmt(r['top_k_overlap']):>7}"
+        )
+    n = len(report)
+    for m in MODES:
+        print(f"mean {m}: plan {sum(r[m]['plan_ms'] for r in report) / n:.3f} ms, "
+              f"plan+search {sum(r[m]['plan_search_ms'] for r in report) / n:.1f} ms")
+    print(f"mean term Jaccard {sum(r['term_jaccard'] for r in report) / n:.3f}")
+    if args.fixtures:
+        print(f"mean url Jaccard {sum(r['url_jaccard'] for r in report) / n:.3f}, "
+              f"mean top-{EVIDENCE_TOP_K} overlap {sum(r['top_k_overlap'] for r in report) / n:.3f}")
+    else:
+        print("url Jaccard / top-k overlap: n/a with synthetic results (pass --fixtures to compare retrieval)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+# benchmarks/harness.py
+#
+# Offline providers for benchmarks, with injectable latency.
+# install() registers them as the "bench" chat/embed/search providers and selects them,
+# so the real pipeline (caches, concurrency, tracing) runs end to end with no network.
+# Responses are replayed from a recorded fixtures file when one is given, otherwise
+# they come from the deterministic local providers.
+#
+# Must be imported before anything under backend/ so the cache settings below are
+# seen by backend.config.
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+os.environ.setdefault("EMBED_CACHE_PATH", "")
+os.environ.setdefault("SEARCH_CACHE_PATH", "")
+os.environ.setdefault("RESULT_CACHE_PATH", "")
+os.environ.setdefault("EVIDENCE_STORE_PATH", "")
+os.environ.setdefault("BUY_LINK_CACHE_PATH", "")
+os.environ.setdefault("LLM_CACHE_PATH", "")
+os.environ.setdefault("GIFTBOT_TRACE_LOG", "0")
+
+from backend import llm, providers, search_providers  # noqa: E402
+from backend.result_cache import result_cache  # noqa: E402
+from backend.buy_link_cache import buy_link_cache  # noqa: E402
+from backend.semantic_cache import evidence_cache  # noqa: E402
+from backend.evidence_store import evidence_store  # noqa: E402
+from backend.local_providers import canned_response, hashing_embedding, prompt_kind, synthetic_results  # noqa: E402
+from backend.models import SearchResult  # noqa: E402
+from backend.providers import ChatProvider, ChatResult, EmbedProvider, EmbedResult, SearchProvider  # noqa: E402
+
+
+class Latency:
+    """Injected latency per call kind, in milliseconds."""
+
+    def __init__(self, llm_ms: float = 0.0, embed_ms: float = 0.0, search_ms: float = 0.0):
+        self.llm_ms = llm_ms
+        self.embed_ms = embed_ms
+        self.search_ms = search_ms
+
+
+class CallCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+
+    def bump(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts.clear()
+
+
+def _hash(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def _tokens(text: str) -> int:
+    return len(text) // 4
+
+
+class Fixtures:
+    """
+    Recorded responses: {"llm": {hash: text}, "embed": {hash: vector}, "search": {query: [result dicts]}}.
+    Lookups that miss fall back to the local providers' generators.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.llm: Dict[str, str] = {}
+        self.embed: Dict[str, List[float]] = {}
+        self.search: Dict[str, List[dict]] = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.llm = data.get("llm", {})
+            self.embed = data.get("embed", {})
+            self.search = data.get("search", {})
+
+    def save(self, path: Optional[str] = None) -> None:
+        with open(path or self.path, "w", encoding="utf-8") as f:
+            json.dump({"llm": self.llm, "embed": self.embed, "search": self.search}, f)
+
+    def llm_output(self, system: str, user: str) -> str:
+        return self.llm.get(_hash(system, user)) or canned_response(system, user)
+
+    def embedding(self, text: str) -> List[float]:
+        return self.embed.get(_hash(text)) or hashing_embedding(text)
+
+    def search_results(self, query: str) -> List[SearchResult]:
+        rows = self.search.get(query)
+        if rows is None:
+            return synthetic_results(query)
+        return [SearchResult(**r) for r in rows]
+
+
+class BenchChat(ChatProvider):
+    name = "bench"
+    model = "bench-chat"
+
+    def __init__(self, fixtures: Fixtures, latency: Latency, calls: CallCounter):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.calls = calls
+
+    def _respond(self, system: str, user: str) -> ChatResult:
+        self.calls.bump(f"llm.{prompt_kind(system, user)}")
+        out = self.fixtures.llm_output(system, user)
+        return ChatResult(out, _tokens(system + user), _tokens(out))
+
+    def complete(self, system: str, user: str, json_mode: bool = False) -> ChatResult:
+        time.sleep(self.latency.llm_ms / 1000.0)
+        return self._respond(system, user)
+
+    async def acomplete(self, system: str, user: str, json_mode: bool = False) -> ChatResult:
+        await asyncio.sleep(self.latency.llm_ms / 1000.0)
+        return self._respond(system, user)
+
+    async def astream(self, system: str, user: str) -> AsyncIterator[ChatResult]:
+        res = await self.acomplete(system, user)
+        for word in res.text.split(" "):
+            yield ChatResult(word + " ")
+        yield ChatResult("", res.input_tokens, res.output_tokens)
+
+
+class BenchEmbed(EmbedProvider):
+    name = "bench"
+    model = "bench-embed"
+
+    def __init__(self, fixtures: Fixtures, latency: Latency, calls: CallCounter):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.calls = calls
+
+    def _embed(self, texts: List[str]) -> EmbedResult:
+        self.calls.bump("embed.api_calls")
+        return EmbedResult([self.fixtures.embedding(t) for t in texts], sum(_tokens(t) for t in texts))
+
+    def embed(self, texts: List[str]) -> EmbedResult:
+        time.sleep(self.latency.embed_ms / 1000.0)
+        return self._embed(texts)
+
+    async def aembed(self, texts: List[str]) -> EmbedResult:
+        await asyncio.sleep(self.latency.embed_ms / 1000.0)
+        return self._embed(texts)
+
+
+class BenchSearch(SearchProvider):
+    name = "bench"
+
+    def __init__(self, fixtures: Fixtures, latency: Latency, calls: CallCounter):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.calls = calls
+
+    def search(self, query: str) -> List[SearchResult]:
+        self.calls.bump("search.live")
+        time.sleep(self.latency.search_ms / 1000.0)
+        return self.fixtures.search_results(query)
+
+
+def install(latency: Latency, fixtures: Optional[Fixtures] = None) -> CallCounter:
+    """Registers and selects the "bench" providers; returns their call counter."""
+    fixtures = fixtures or Fixtures()
+    calls = CallCounter()
+    providers.register("chat", "bench", lambda: BenchChat(fixtures, latency, calls))
+    providers.register("embed", "bench", lambda: BenchEmbed(fixtures, latency, calls))
+    providers.register("search", "bench", lambda: BenchSearch(fixtures, latency, calls))
+    for kind in ("chat", "embed", "search"):
+        providers.select(kind, "bench")
+    return calls
+
+
+class _RecordingChat(ChatProvider):
+    def __init__(self, inner: ChatProvider, fixtures: Fixtures):
+        self.inner = inner
+        self.fixtures = fixtures
+        self.name = inner.name
+        self.model = inner.model
+
+    def complete(self, system: str, user: str, json_mode: bool = False) -> ChatResult:
+        res = self.inner.complete(system, user, json_mode)
+        self.fixtures.llm[_hash(system, user)] = res.text
+        return res
+
+    async def acomplete(self, system: str, user: str, json_mode: bool = False) -> ChatResult:
+        res = await self.inner.acomplete(system, user, json_mode)
+        self.fixtures.llm[_hash(system, user)] = res.text
+        return res
+
+    async def astream(self, system: str, user: str) -> AsyncIterator[ChatResult]:
+        # Recording without streaming keeps one complete text per prompt
+        yield await self.acomplete(system, user)
+
+
+class _RecordingEmbed(EmbedProvider):
+    def __init__(self, inner: EmbedProvider, fixtures: Fixtures):
+        self.inner = inner
+        self.fixtures = fixtures
+        self.name = inner.name
+        self.model = inner.model
+
+    def _keep(self, texts: List[str], res: EmbedResult) -> EmbedResult:
+        for t, v in zip(texts, res.vectors):
+            self.fixtures.embed[_hash(t)] = list(v)
+        return res
+
+    def embed(self, texts: List[str]) -> EmbedResult:
+        return self._keep(texts, self.inner.embed(texts))
+
+    async def aembed(self, texts: List[str]) -> EmbedResult:
+        return self._keep(texts, await self.inner.aembed(texts))
+
+
+class _RecordingSearch(SearchProvider):
+    def __init__(self, inner: SearchProvider, fixtures: Fixtures):
+        self.inner = inner
+        self.fixtures = fixtures
+        self.name = inner.name
+
+    def search(self, query: str) -> List[SearchResult]:
+        results = self.inner.search(query)
+        self.fixtures.search[query] = [r.model_dump() for r in results]
+        return results
+
+
+def record(path: str) -> Fixtures:
+    """
+    Wraps the configured (live) providers so every response is captured into a Fixtures
+    object; call .save() on it after driving the pipeline. Needs real API keys.
+    """
+    fixtures = Fixtures()
+    fixtures.path = path
+    chat, embed, search = providers.chat_provider(), providers.embed_provider(), providers.search_provider()
+    providers.register("chat", "record", lambda: _RecordingChat(chat, fixtures))
+    providers.register("embed", "record", lambda: _RecordingEmbed(embed, fixtures))
+    providers.register("search", "record", lambda: _RecordingSearch(search, fixtures))
+    for kind in ("chat", "embed", "search"):
+        providers.select(kind, "record")
+    return fixtures
+
+
+def clear_caches() -> None:
+    """Empties the in-memory caches so the next request takes the cold path."""
+    llm._embed_cache.memory.clear()
+    llm._response_cache.clear()
+    search_providers._search_cache.clear()
+    result_cache.clear()
+    buy_link_cache.clear()
+    evidence_cache.clear()
+    evidence_store.clear()
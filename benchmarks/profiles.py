@@ -0,0 +1,36 @@
+# benchmarks/profiles.py
+# Profile corpus for benchmarks: a mix of popular (repeating) and long-tail requests.
+
+from typing import List
+
+from backend.models import GiftProfile
+
+PROFILES: List[GiftProfile] = [
+    GiftProfile(relationship="mom", occasion="Mother's Day", budget_usd=50, interests="gardening, tea"),
+    GiftProfile(relationship="sister", age="29", occasion="birthday", budget_usd=50, interests="books, yoga", personality="minimalist"),
+    GiftProfile(relationship="partner", occasion="anniversary", budget_usd=100, interests="cooking, travel", personality="sentimental"),
+    GiftProfile(relationship="coworker", occasion="farewell", budget_usd=30, personality="practical", no_go="no alcohol"),
+    GiftProfile(relationship="dad", occasion="Father's Day", budget_usd=75, interests="grilling, golf"),
+    GiftProfile(relationship="friend", age="30s", occasion="housewarming", budget_usd=40, interests="plants, coffee"),
+    GiftProfile(relationship="brother", age="17", occasion="graduation", budget_usd=60, interests="gaming, sneakers", personality="playful"),
+    GiftProfile(relationship="grandmother", occasion="Christmas", budget_usd=50, interests="knitting, puzzles", no_go="no perfume"),
+    GiftProfile(relationship="boss", occasion="holiday", budget_usd=40, personality="practical", no_go="no clothes, no alcohol"),
+    GiftProfile(relationship="best friend", age="25", occasion="birthday", budget_usd=35, interests="astrology, candles", personality="sentimental"),
+    GiftProfile(relationship="teacher", occasion="end of school year", budget_usd=25, interests="reading"),
+    GiftProfile(relationship="niece", age="8", occasion="birthday", budget_usd=40, interests="art, unicorns", personality="playful"),
+]
+
+
+def corpus(n: int, popular_share: float = 0.5) -> List[GiftProfile]:
+    """
+    n profiles where roughly popular_share of them repeat the first two profiles
+    (seasonal spikes) and the rest cycle through the whole list.
+    """
+    out: List[GiftProfile] = []
+    every = max(1, round(1 / popular_share)) if popular_share > 0 else 0
+    for i in range(n):
+        if every and i % every == 0:
+            out.append(PROFILES[(i // every) % 2])
+        else:
+            out.append(PROFILES[i % len(PROFILES)])
+    return out
@@ -0,0 +1,119 @@
+# benchmarks/run_bench.py
+#
+# Offline end-to-end benchmark of the recommender.
+#   python -m benchmarks.run_bench --requests 48 --concurrency 1,4,16 --llm-ms 800 --search-ms 400
+#   python -m benchmarks.run_bench --record fixtures.json     (live keys; then replay with --fixtures)
+# Each request runs generate_batch_with_cards (the path app.py takes) under a trace; the
+# report shows per-stage latency percentiles, call counts and throughput per concurrency level.
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from benchmarks.harness import CallCounter, Fixtures, Latency, clear_caches, install, record
+from benchmarks.profiles import corpus
+
+from backend.models import GiftProfile
+from backend.recommender import generate_batch_with_cards
+from backend.tracing import trace
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    idx = min(len(s) - 1, max(0, int(round(q / 100.0 * (len(s) - 1)))))
+    return s[idx]
+
+
+def _one_request(profile: GiftProfile, k: int) -> Dict[str, Any]:
+    with trace("bench") as t:
+        generate_batch_with_cards(profile, exclude_names=set(), k=k)
+    return t.to_dict()
+
+
+def run_level(profiles: List[GiftProfile], concurrency: int, k: int, cold: bool, calls: CallCounter) -> Dict[str, Any]:
+    if cold:
+        clear_caches()
+    calls.reset()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        traces = list(pool.map(lambda p: _one_request(p, k), profiles))
+    wall = time.perf_counter() - started
+
+    stages: Dict[str, List[float]] = {"total": [t["duration_ms"] for t in traces]}
+    counters: Dict[str, float] = {}
+    for t in traces:
+        for name, ms in t["stages_ms"].items():
+            if name.startswith("stage."):
+                stages.setdefault(name[len("stage."):], []).append(ms)
+        for key, n in t["counters"].items():
+            counters[key] = counters.get(key, 0) + n
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(traces),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(traces) / wall, 2) if wall else None,
+        "latency_ms": {
+            name: {q: round(percentile(v, float(q[1:])), 1) for q in ("p50", "p95", "p99")}
+            for name, v in stages.items()
+        },
+        "counters": {k: round(v, 1) for k, v in sorted(counters.items())},
+        "backend_calls": dict(sorted(calls.counts.items())),
+    }
+
+
+def _print_level(r: Dict[str, Any]) -> None:
+    print(f"\n== concurrency {r['concurrency']}: {r['requests']} requests in {r['wall_s']}s "
+          f"({r['throughput_rps']} req/s)")
+    print(f"{'stage':<18}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, q in r["latency_ms"].items():
+        print(f"{name:<18}{q['p50']:>10}{q['p95']:>10}{q['p99']:>10}")
+    print("counters: " + ", ".join(f"{k}={v:g}" for k, v in r["counters"].items()))
+    print("backend calls: " + ", ".join(f"{k}={v}" for k, v in r["backend_calls"].items()))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Offline GiftBot pipeline benchmark")
+    ap.add_argument("--requests", type=int, default=24)
+    ap.add_argument("--concurrency", default="1,4,16", help="comma-separated levels")
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--llm-ms", type=float, default=600.0, help="injected latency per LLM call")
+    ap.add_argument("--embed-ms", type=float, default=150.0, help="injected latency per embeddings call")
+    ap.add_argument("--search-ms", type=float, default=350.0, help="injected latency per live search")
+    ap.add_argument("--popular-share", type=float, default=0.5, help="share of requests repeating popular profiles")
+    ap.add_argument("--fixtures", default=None, help="recorded fixtures JSON to replay (synthetic otherwise)")
+    ap.add_argument("--warm", action="store_true", help="keep caches between levels instead of starting cold")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    ap.add_argument("--record", default=None, help="run the corpus once against the live APIs and save fixtures here")
+    args = ap.parse_args()
+
+    if args.record:
+        fixtures = record(args.record)
+        for p in corpus(args.requests, popular_share=args.popular_share):
+            _one_request(p, args.k)
+        fixtures.save()
+        print(f"Recorded {len(fixtures.llm)} LLM, {len(fixtures.embed)} embedding and "
+              f"{len(fixtures.search)} search responses to {args.record}")
+        return
+
+    calls = install(Latency(args.llm_ms, args.embed_ms, args.search_ms), Fixtures(args.fixtures))
+    profiles = corpus(args.requests, popular_share=args.popular_share)
+
+    report = []
+    for level in [int(x) for x in args.concurrency.split(",") if x.strip()]:
+        r = run_level(profiles, level, args.k, cold=not args.warm, calls=calls)
+        report.append(r)
+        if not args.json:
+            _print_level(r)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
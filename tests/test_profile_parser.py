@@ -0,0 +1,127 @@
+import json
+
+import pytest
+
+from backend import profile_parser
+from backend.config import PROFILE_PARSER_MIN_CONFIDENCE
+from backend.profile_parser import local_profile, profile_from_prompt, unresolved_fields
+
+
+@pytest.fixture
+def no_llm(monkeypatch):
+    def _fail(*args, **kwargs):
+        raise AssertionError("the LLM should not be called")
+    monkeypatch.setattr(profile_parser, "llm_json", _fail)
+
+
+def _confident(prompt):
+    return {
+        name: value for name, (value, confidence) in local_profile(prompt).items()
+        if confidence >= PROFILE_PARSER_MIN_CONFIDENCE
+    }
+
+
+def test_interests_stop_at_budget_and_no_go_clauses(no_llm):
+    profile = profile_from_prompt("she loves gardening and tea, $50 max, no candles")
+    assert profile["interests"] == "gardening, tea"
+    assert profile["budget_usd"] == 50.0
+    assert profile["exclude_ideas"] == ["candles"]
+
+
+def test_no_go_list_is_split_on_and_or():
+    assert _confident("hates jewelry and perfume")["exclude_ideas"] == ["jewelry", "perfume"]
+    assert _confident("no candles or mugs please")["exclude_ideas"] == ["candles", "mugs"]
+
+
+def test_negated_interest_is_not_an_interest():
+    found = _confident("she is not into sports, likes baking")
+    assert found["interests"] == "baking"
+    assert found["exclude_ideas"] == ["sports"]
+    assert "interests" not in _confident("he doesn't like golf")
+    assert "interests" not in _confident("not a big fan of crafts")
+
+
+def test_vague_no_go_goes_to_the_llm():
+    extracted = local_profile("nothing too personal")
+    assert extracted["exclude_ideas"][1] < PROFILE_PARSER_MIN_CONFIDENCE
+    assert "exclude_ideas" in unresolved_fields("nothing too personal", extracted)
+
+
+def test_age_from_who_is(no_llm):
+    profile = profile_from_prompt("my son who is 8")
+    assert profile["relationship"] == "son"
+    assert profile["age"] == 8
+
+
+def test_budget_is_not_an_age():
+    extracted = local_profile("my budget is 50 for my sister")
+    assert extracted["age"] == (None, 0.0)
+    assert "age" not in unresolved_fields("my budget is 50 for my sister", extracted)
+
+
+def test_conflicting_values_are_not_confident():
+    assert local_profile("my 8 year old son and his 12 year old cousin")["age"][1] < PROFILE_PARSER_MIN_CONFIDENCE
+    assert local_profile("somewhere between $20 and $80")["budget_usd"][1] < PROFILE_PARSER_MIN_CONFIDENCE
+
+
+def test_local_path_keeps_extra_notes(no_llm):
+    profile = profile_from_prompt("Gift for my sister, she loves hiking. She just moved to Denver.")
+    assert profile["extra"] == "She just moved to Denver"
+
+
+def test_llm_fills_only_unresolved_fields(monkeypatch):
+    calls = []
+
+    def _fake(system, user, **kwargs):
+        calls.append(user)
+        return json.dumps({"exclude_ideas": ["personalized items"], "interests": "ignored", "extra": ""})
+
+    monkeypatch.setattr(profile_parser, "llm_json", _fake)
+    profile = profile_from_prompt("she loves tea, nothing too personal")
+    assert len(calls) == 1 and "Fields still needed: exclude_ideas" in calls[0]
+    assert profile["exclude_ideas"] == ["personalized items"]
+    assert profile["interests"] == "tea"
+
+
+@pytest.mark.parametrize("prompt", [
+    "gift for my sister's husband",
+    "something for my boyfriend's mom",
+    "a present for my mother-in-law",
+])
+def test_possessive_and_in_law_relationships_are_not_confident(prompt):
+    assert "relationship" not in _confident(prompt)
+    assert "relationship" in unresolved_fields(prompt, local_profile(prompt))
+
+
+@pytest.mark.parametrize("prompt", ["he's 6 feet tall", "she is 5'4", "gift for a baby shower"])
+def test_heights_and_baby_showers_are_not_ages(prompt):
+    assert "age" not in _confident(prompt)
+
+
+@pytest.mark.parametrize("prompt", [
+    "he is under 5",
+    "toys for kids under 10",
+    "happy to spend 2 hours making it",
+    "max 3 items",
+])
+def test_bare_numbers_are_not_budgets(prompt):
+    assert "budget_usd" not in _confident(prompt)
+
+
+def test_budget_needs_a_currency_sign_or_budget_word():
+    assert _confident("budget of 50")["budget_usd"] == 50.0
+    assert _confident("under $40")["budget_usd"] == 40.0
+
+
+def test_interests_stop_at_occasion_and_time_words():
+    assert _confident("loves baking, birthday next week")["interests"] == "baking"
+    assert _confident("into christmas movies and knitting")["interests"] == "christmas movies, knitting"
+
+
+def test_age_is_a_number_or_none(monkeypatch):
+    monkeypatch.setattr(profile_parser, "llm_json", lambda *a, **k: json.dumps({"age": "teen"}))
+    assert profile_from_prompt("for my nephew, a teen")["age"] is None
+    assert _confident("for my aunt, in her 30s")["age"] == 35
+    assert _confident("my daughter is 8")["age"] == 8
+    age, confidence = local_profile("for a toddler")["age"]
+    assert age == 2 and confidence < PROFILE_PARSER_MIN_CONFIDENCE
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+from backend.query_planner import rule_based_queries
+
+
+def _app_profile(**overrides):
+    # Same shape as app._profile_from_state(): age comes from st.number_input
+    fields = dict(
+        recipient="", relationship="Sister", age=29, personality="playful", interests="books, tea",
+        occasion="birthday", budget=50.0, budget_usd=50.0, no_go="", exclude_ideas=[],
+        extra="", extra_notes="", prompt="",
+    )
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+def test_int_age_from_number_input():
+    queries = rule_based_queries(_app_profile(age=29))
+    assert any("for 29 year old sister" in q for q in queries)
+
+
+def test_missing_and_zero_age():
+    for age in (None, 0, ""):
+        queries = rule_based_queries(_app_profile(age=age))
+        assert len(queries) == 6
+        assert not any("year old" in q for q in queries)
+
+
+def test_decade_age_string():
+    queries = rule_based_queries(_app_profile(age="30s"))
+    assert any("for sister in their 30s" in q for q in queries)
+
+
+def test_non_string_fields_are_coerced():
+    queries = rule_based_queries(_app_profile(interests=None, personality=None, occasion=None))
+    assert queries and all(q == " ".join(q.split()) for q in queries)
+
+
+def test_budget_is_written_out_in_full():
+    for budget, text in ((50.0, "under $50"), (49.99, "under $49.99"), (1_500_000, "under $1,500,000"), (1234567.5, "under $1,234,567.50")):
+        queries = rule_based_queries(_app_profile(budget_usd=budget))
+        assert any(q.endswith(text) for q in queries), (budget, queries)
+        assert not any("e+" in q for q in queries)